@@ -1,8 +1,21 @@
 import random
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, Awaitable, Callable, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
+from config import config
+from categorizer import categorizer
+from database import AsyncSessionLocal, release_connection
+from recipe_cache import recipe_cache, make_recipe_key, ingredient_keys
+from recipe_engine import recipe_engine
+from recipe_store import save_user_recipe
+from singleflight import SingleFlight
+from suggestions import fridge_fingerprint, suggestion_buffer
+from user_cache import user_cache
+from ingredient_parser import ParsedIngredient
+from user_context import UserContext, UserProfile
+
 try:
     from gigachat_client import gigachat_client
 except ImportError:
@@ -21,81 +34,61 @@ except ImportError:
 
 class ChefAgent:
     def __init__(self):
-        self.recipes_db = self._initialize_recipes()
+        self.generation_flight = SingleFlight()
         
-    def _initialize_recipes(self) -> Dict[str, List[Dict]]:
-        """Инициализация базы готовых рецептов"""
-        return {
-            "яйца_овощи": [
-                {
-                    "title": "🍳 Омлет с помидорами",
-                    "ingredients": ["Яйца - 3 шт", "Помидоры - 2 шт", "Лук - 0.5 шт", "Соль - по вкусу", "Масло - 1 ст.л."],
-                    "instructions": [
-                        "1. Нарежьте помидоры и лук",
-                        "2. Взбейте яйца с солью",
-                        "3. Обжарьте лук до прозрачности",
-                        "4. Добавьте помидоры, затем яичную смесь",
-                        "5. Готовьте под крышкой 7 минут"
-                    ],
-                    "cooking_time": 15,
-                    "difficulty": "легко"
-                }
-            ],
-            "курица_овощи": [
-                {
-                    "title": "🍗 Курица с овощами",
-                    "ingredients": ["Куриное филе - 300г", "Помидоры - 2 шт", "Лук - 1 шт", "Соль - по вкусу", "Масло - 2 ст.л."],
-                    "instructions": [
-                        "1. Нарежьте курицу и овощи",
-                        "2. Обжарьте курицу до золотистой корочки",
-                        "3. Добавьте овощи и тушите 15 минут",
-                        "4. Посолите и поперчите по вкусу"
-                    ],
-                    "cooking_time": 25,
-                    "difficulty": "легко"
-                }
-            ],
-            "мясо_гарнир": [
-                {
-                    "title": "🍖 Мясо с гарниром",
-                    "ingredients": ["Мясо - 400г", "Рис - 150г", "Лук - 1 шт", "Соль - по вкусу", "Масло - 2 ст.л."],
-                    "instructions": [
-                        "1. Нарежьте мясо и обжарьте с луком",
-                        "2. Отварите рис отдельно",
-                        "3. Подавайте мясо с рисом"
-                    ],
-                    "cooking_time": 30,
-                    "difficulty": "средне"
-                }
-            ]
-        }
+    async def load_user_context(self, db: AsyncSession, user_id: int) -> UserContext:
+        """Загружает профиль и содержимое холодильника одним запросом к БД"""
+        profile = user_cache.profiles.get(user_id)
+        fridge_items = user_cache.fridge.get(user_id)
+        if profile is not None and fridge_items is not None:
+            # False в кэше профилей - пользователь не зарегистрирован
+            return UserContext(user_id, profile or None, fridge_items)
+        
+        result = await db.execute(
+            text("""
+                SELECT u.telegram_id, u.username, u.first_name, u.last_name,
+                       u.dietary_preferences, u.allergies, u.cooking_skill, u.created_at,
+                       COALESCE(
+                           (SELECT json_agg(json_build_object(
+                                       'name', f.ingredient_name, 'canonical_name', f.canonical_name,
+                                       'quantity', f.quantity, 'amount', f.amount, 'unit', f.unit,
+                                       'category', f.category
+                                   ) ORDER BY f.id)
+                            FROM fridge_items f WHERE f.user_id = p.user_id),
+                           '[]'::json
+                       ) AS fridge_items
+                FROM (SELECT CAST(:user_id AS BIGINT) AS user_id) AS p
+                LEFT JOIN users u ON u.telegram_id = p.user_id
+            """),
+            {"user_id": user_id}
+        )
+        row = result.one()
+        
+        profile = UserProfile.from_row(row) if row.telegram_id is not None else None
+        fridge_items = tuple(ParsedIngredient.from_row(item) for item in row.fridge_items)
+        user_cache.profiles.set(user_id, profile or False)
+        user_cache.fridge.set(user_id, fridge_items)
+        return UserContext(user_id, profile, fridge_items)
     
     async def analyze_fridge(self, db: AsyncSession, user_id: int) -> List[str]:
         """Анализирует содержимое холодильника"""
         try:
-            result = await db.execute(
-                text("SELECT ingredient_name FROM fridge_items WHERE user_id = :user_id"),
-                {"user_id": user_id}
-            )
-            items = result.fetchall()
-            return [item.ingredient_name for item in items]
+            context = await self.load_user_context(db, user_id)
+            return [item.label for item in context.fridge_items]
         except Exception as e:
             print(f"❌ Ошибка при анализе холодильника: {e}")
             return []
     
+    async def get_user_profile(self, db: AsyncSession, user_id: int) -> Optional[UserProfile]:
+        """Получает профиль пользователя или None, если пользователь не зарегистрирован"""
+        context = await self.load_user_context(db, user_id)
+        return context.profile
+    
     async def get_user_preferences(self, db: AsyncSession, user_id: int) -> Dict[str, Any]:
         """Получает предпочтения пользователя"""
         try:
-            result = await db.execute(
-                text("SELECT dietary_preferences, allergies, cooking_skill FROM users WHERE telegram_id = :user_id"),
-                {"user_id": user_id}
-            )
-            user = result.first()
-            return {
-                "dietary_preferences": user.dietary_preferences if user else [],
-                "allergies": user.allergies if user else [],
-                "cooking_skill": user.cooking_skill if user else "новичок"
-            }
+            context = await self.load_user_context(db, user_id)
+            return context.preferences
         except Exception as e:
             print(f"❌ Ошибка при получении предпочтений: {e}")
             return {
@@ -104,140 +97,251 @@ class ChefAgent:
                 "cooking_skill": "новичок"
             }
     
-    def _select_ingredients_for_recipe(self, all_ingredients: List[str]) -> List[str]:
+    def _select_ingredients_for_recipe(self, all_ingredients: List[ParsedIngredient]) -> List[ParsedIngredient]:
         """Умно выбирает подходящие комбинации ингредиентов для рецепта"""
-        print(f"🔄 Выбираем ингредиенты из: {all_ingredients}")
-        
-        # Парсим ингредиенты для анализа
-        parsed_ingredients = []
-        for ing in all_ingredients:
-            if " " in ing:
-                name = ing.split(" ")[0].lower()
-                parsed_ingredients.append(name)
-            else:
-                parsed_ingredients.append(ing.lower())
-        
-        # Группируем ингредиенты по категориям
-        categories = {
-            "белки": [],
-            "овощи": [],
-            "гарниры": [],
-            "молочные": [],
-            "бакалея": []
-        }
+        print(f"🔄 Выбираем ингредиенты из: {[item.label for item in all_ingredients]}")
         
-        for ing in parsed_ingredients:
-            if any(protein in ing for protein in ["куриц", "филе", "мясо", "говядин", "свинин", "рыба", "яйц"]):
-                categories["белки"].append(ing)
-            elif any(veggie in ing for veggie in ["помидор", "огурец", "морковь", "лук", "перец", "баклажан", "кабачок", "картош", "капуст"]):
-                categories["овощи"].append(ing)
-            elif any(carb in ing for carb in ["рис", "паста", "спагетти", "макарон", "греч", "пшено"]):
-                categories["гарниры"].append(ing)
-            elif any(dairy in ing for dairy in ["молоко", "сыр", "сметан", "творог", "йогурт", "кефир"]):
-                categories["молочные"].append(ing)
-            else:
-                categories["бакалея"].append(ing)
+        # Категория определена при добавлении продукта, повторно разбирать названия не нужно
+        categories = defaultdict(list)
+        for item in all_ingredients:
+            categories[item.category or categorizer.categorize(item.canonical_name)].append(item)
+        
+        grouped = {name: [item.label for item in items] for name, items in categories.items()}
+        print(f"📊 Сгруппированные ингредиенты: {grouped}")
         
-        print(f"📊 Сгруппированные ингредиенты: {categories}")
+        proteins = categories["белки"]
+        veggies = categories["овощи"]
+        carbs = categories["гарниры"]
+        dairy = categories["молочные"]
         
         # Выбираем логичные комбинации
         selected_ingredients = []
         
         # Всегда берем 1 белок (если есть)
-        if categories["белки"]:
-            protein = random.choice(categories["белки"])
-            # Находим полное название с количеством
-            full_protein = next((ing for ing in all_ingredients if protein in ing.lower()), protein)
-            selected_ingredients.append(full_protein)
+        if proteins:
+            selected_ingredients.append(random.choice(proteins))
         
         # Берем 1-2 овоща (если есть)
-        if categories["овощи"]:
-            veggies = random.sample(categories["овощи"], min(2, len(categories["овощи"])))
-            for veggie in veggies:
-                full_veggie = next((ing for ing in all_ingredients if veggie in ing.lower()), veggie)
-                selected_ingredients.append(full_veggie)
+        if veggies:
+            selected_ingredients.extend(random.sample(veggies, min(2, len(veggies))))
         
         # Берем 1 гарнир (если есть и если выбран белок)
-        if categories["гарниры"] and categories["белки"]:
-            carb = random.choice(categories["гарниры"])
-            full_carb = next((ing for ing in all_ingredients if carb in ing.lower()), carb)
-            selected_ingredients.append(full_carb)
+        if carbs and proteins:
+            selected_ingredients.append(random.choice(carbs))
         
-        # Берем 1 молочный продукт (только для определенных комбинаций)
-        if categories["молочные"] and any(dairy in selected_ingredients for dairy in ["яйц", "творог"]):
-            dairy = random.choice(categories["молочные"])
-            full_dairy = next((ing for ing in all_ingredients if dairy in ing.lower()), dairy)
-            selected_ingredients.append(full_dairy)
+        # Берем 1 молочный продукт (только для блюд из яиц или творога)
+        if dairy and any(word in item.canonical_name for item in selected_ingredients for word in ["яйц", "творог"]):
+            selected_ingredients.append(random.choice(dairy))
         
         # Если выбрано слишком мало, добавляем еще овощей
-        if len(selected_ingredients) < 2 and categories["овощи"]:
-            extra_veggies = [v for v in categories["овощи"] if v not in selected_ingredients]
+        if len(selected_ingredients) < 2 and veggies:
+            extra_veggies = [v for v in veggies if v not in selected_ingredients]
             if extra_veggies:
-                extra = random.choice(extra_veggies)
-                full_extra = next((ing for ing in all_ingredients if extra in ing.lower()), extra)
-                selected_ingredients.append(full_extra)
+                selected_ingredients.append(random.choice(extra_veggies))
         
-        print(f"✅ Выбраны ингредиенты: {selected_ingredients}")
+        print(f"✅ Выбраны ингредиенты: {[item.label for item in selected_ingredients]}")
         return selected_ingredients
     
-    async def create_recipe(self, ingredients: List[str], preferences: Dict) -> Dict[str, Any]:
-        """Создает рецепт на основе выбранных ингредиентов"""
+    async def create_recipe(self, ingredients: List[ParsedIngredient], preferences: Dict, db: AsyncSession = None,
+                            on_progress: Optional[Callable[[str], Awaitable[None]]] = None,
+                            user_id: Optional[int] = None, generated_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Создает рецепт на основе выбранных ингредиентов.
+        on_progress получает накопленный текст, если рецепт генерируется потоково.
+        С user_id сначала отдаются рецепты, отложенные пользователю из прошлой пакетной генерации,
+        а лишние рецепты новой пакетной генерации откладываются ему же.
+        С generated_only вместо локального рецепта возвращается None"""
+        
+        names = [item.canonical_name for item in ingredients]
+        print(f"🔄 Создание рецепта из всех ингредиентов: {names}")
+        
+        fingerprint = fridge_fingerprint(names, preferences)
+        if user_id is not None:
+            suggestion = suggestion_buffer.pop(user_id, fingerprint)
+            if suggestion:
+                print(f"⚡ Отдаем отложенный рецепт: {suggestion['title']}")
+                return suggestion
+        
+        recipes = await self._create_recipes(ingredients, preferences, db, on_progress, generated_only)
+        if not recipes:
+            return None
+        # Первый рецепт отдаем сразу, остальные пользователь получит следующими нажатиями без запроса к GigaChat
+        if user_id is not None and len(recipes) > 1:
+            suggestion_buffer.push(user_id, fingerprint, recipes[1:])
+        return recipes[0]
+    
+    async def _create_recipes(self, ingredients: List[ParsedIngredient], preferences: Dict, db: Optional[AsyncSession],
+                              on_progress: Optional[Callable[[str], Awaitable[None]]],
+                              generated_only: bool) -> List[Dict[str, Any]]:
+        """Рецепты для выбранных ингредиентов в порядке показа: один локальный или из кэша,
+        либо все рецепты одного вызова GigaChat. С generated_only - только рецепты GigaChat"""
+        names = [item.canonical_name for item in ingredients]
         
-        print(f"🔄 Создание рецепта из всех ингредиентов: {ingredients}")
+        # Все продукты готового рецепта есть в холодильнике - GigaChat не нужен
+        if config.LOCAL_RECIPES_FIRST and not generated_only:
+            local_recipe = recipe_engine.find(names, preferences, config.LOCAL_RECIPE_MIN_COVERAGE)
+            if local_recipe:
+                print(f"⚡ Найден локальный рецепт: {local_recipe['title']}")
+                return [local_recipe]
         
         # Умно выбираем подходящие ингредиенты для одного рецепта
         selected_ingredients = self._select_ingredients_for_recipe(ingredients)
         
         if not selected_ingredients:
             print("❌ Не удалось выбрать подходящие ингредиенты")
-            return self._get_fallback_recipe(ingredients)
+            return [] if generated_only else [self._get_fallback_recipe([item.label for item in ingredients])]
+        
+        # Такой же набор продуктов и предпочтений уже встречался - отдаем рецепт из кэша
+        cache_key = make_recipe_key([item.canonical_name for item in selected_ingredients], preferences)
+        cached_recipe = await recipe_cache.get(cache_key, db)
+        if cached_recipe:
+            print("⚡ Рецепт найден в кэше")
+            return [cached_recipe]
         
-        # В первую очередь пытаемся использовать GigaChat
+        # В первую очередь пытаемся использовать GigaChat.
+        # Одинаковые запросы, пришедшие во время генерации, ждут тот же вызов
         if gigachat_client.is_available():
+            # GigaChat недавно отказывал - не ждем таймаута, сразу берем локальный рецепт
+            if gigachat_client.breaker.is_open:
+                print("⚡ GigaChat временно недоступен, используем локальный рецепт")
+                return [] if generated_only else [self._get_local_recipe(names, selected_ingredients, preferences)]
+            # Бюджет запросов к GigaChat исчерпан - по настройке отвечаем локальным рецептом, не вставая в очередь
+            if config.RATE_LIMIT_DEGRADE and gigachat_client.admission.should_degrade():
+                print("⚠️ GigaChat перегружен, используем локальный рецепт")
+                return [] if generated_only else [self._get_local_recipe(names, selected_ingredients, preferences)]
             try:
-                print(f"🎯 Используем GigaChat для выбранных ингредиентов: {selected_ingredients}")
-                recipe_text = await gigachat_client.generate_recipe(selected_ingredients, preferences)
-                
-                if recipe_text:
-                    print("✅ Получен ответ от GigaChat, парсим...")
-                    parsed_recipe = self._parse_gigachat_response(recipe_text, selected_ingredients)
-                    if parsed_recipe:
-                        print("✅ Успешно использован рецепт от GigaChat")
-                        return parsed_recipe
-                    else:
-                        print("❌ Не удалось распарсить ответ GigaChat")
-                else:
-                    print("❌ GigaChat не вернул рецепт")
-                    
+                # Не держим соединение из пула, пока ждем ответа GigaChat
+                if db is not None:
+                    await release_connection(db)
+                # Все присоединившиеся получают полный список рецептов вызова и сами решают,
+                # что из него отложить
+                generated = await self.generation_flight.do(
+                    cache_key,
+                    lambda: self._generate_with_gigachat(
+                        [item.label for item in selected_ingredients], preferences, cache_key, on_progress
+                    )
+                )
+                if generated:
+                    return generated
             except Exception as e:
                 print(f"❌ Ошибка GigaChat: {e}")
         
+        if generated_only:
+            return []
         # Резервный вариант - локальная база на основе выбранных ингредиентов
-        print("🔄 Используем адаптированный рецепт на основе выбранных продуктов")
+        print("🔄 Используем локальный рецепт на основе выбранных продуктов")
+        return [self._get_local_recipe(names, selected_ingredients, preferences)]
+    
+    async def _generate_with_gigachat(self, ingredients: List[str], preferences: Dict, cache_key: str,
+                                      on_progress: Optional[Callable[[str], Awaitable[None]]] = None) -> List[Dict[str, Any]]:
+        """Генерирует рецепты через GigaChat, парсит их и кладет в кэш.
+        Вызов общий для одинаковых запросов и может пережить сессию любого из них,
+        поэтому с БД работает только через собственную сессию. Пользователей не знает:
+        при пакетной генерации возвращает все рецепты по порядку"""
+        print(f"🎯 Используем GigaChat для выбранных ингредиентов: {ingredients}")
+        if config.RECIPE_BATCH_SIZE > 1:
+            return await self.create_recipe_batch(ingredients, preferences, cache_key, config.RECIPE_BATCH_SIZE)
+        
+        if config.GIGACHAT_JSON_MODE:
+            # Ответ уже проверен по схеме, разбирать текст не нужно
+            parsed_recipe = await gigachat_client.generate_recipe_json(ingredients, preferences)
+            if not parsed_recipe:
+                print("❌ GigaChat не вернул корректный JSON-рецепт")
+                return []
+            print("✅ Успешно использован JSON-рецепт от GigaChat")
+            await self._remember(cache_key, [parsed_recipe])
+            return [parsed_recipe]
+        
+        if on_progress:
+            recipe_text = await self._stream_with_gigachat(ingredients, preferences, on_progress)
+        else:
+            recipe_text = await gigachat_client.generate_recipe(ingredients, preferences)
+        
+        if not recipe_text:
+            print("❌ GigaChat не вернул рецепт")
+            return []
+        
+        print("✅ Получен ответ от GigaChat, парсим...")
+        parsed_recipe = self._parse_gigachat_response(recipe_text, ingredients)
+        if not parsed_recipe:
+            print("❌ Не удалось распарсить ответ GigaChat")
+            return []
+        
+        print("✅ Успешно использован рецепт от GigaChat")
+        await self._remember(cache_key, [parsed_recipe])
+        return [parsed_recipe]
+    
+    async def _remember(self, cache_key: str, recipes: List[Dict[str, Any]]):
+        """Кладет сгенерированные рецепты в кэш через собственную сессию"""
+        async with AsyncSessionLocal() as session:
+            for recipe in recipes:
+                await recipe_cache.put(cache_key, recipe, session)
+    
+    async def prepare_suggestion(self, db: AsyncSession, user_id: int) -> bool:
+        """Заранее готовит рецепт для текущего холодильника и откладывает его пользователю.
+        Откладываются только рецепты GigaChat: локальный рецепт реальный запрос соберет сам"""
+        context = await self.load_user_context(db, user_id)
+        if not context.fridge_items:
+            return False
+        
+        fingerprint = fridge_fingerprint([item.canonical_name for item in context.fridge_items], context.preferences)
+        if suggestion_buffer.pending(user_id, fingerprint):
+            return False
+        
+        # Все рецепты пакета откладываются одним вызовом, в том порядке, в каком их вернул GigaChat
+        recipes = await self._create_recipes(
+            list(context.fridge_items), context.preferences, db, None, generated_only=True
+        )
+        if not recipes:
+            return False
+        suggestion_buffer.push(user_id, fingerprint, recipes)
+        return True
+    
+    async def create_recipe_batch(self, ingredients: List[str], preferences: Dict, cache_key: str,
+                                  count: int) -> List[Dict[str, Any]]:
+        """Генерирует count разных рецептов одним запросом к GigaChat и кладет все в кэш"""
+        recipes = await gigachat_client.generate_recipe_batch(ingredients, preferences, count)
+        if not recipes:
+            print("❌ GigaChat не вернул рецепты")
+            return []
+        
+        await self._remember(cache_key, recipes)
+        print(f"✅ Успешно использованы рецепты от GigaChat: {len(recipes)}")
+        return recipes
+    
+    async def _stream_with_gigachat(self, ingredients: List[str], preferences: Dict,
+                                    on_progress: Callable[[str], Awaitable[None]]) -> str:
+        """Собирает потоковый ответ GigaChat, сообщая о прогрессе после каждого фрагмента"""
+        recipe_text = ""
+        async for chunk in gigachat_client.stream_recipe(ingredients, preferences):
+            recipe_text += chunk
+            try:
+                await on_progress(recipe_text)
+            except Exception as e:
+                # Сбой отображения прогресса не должен прерывать генерацию
+                print(f"⚠️ Ошибка отображения прогресса: {e}")
+        return recipe_text
+    
+    def _get_local_recipe(self, ingredients: List[str], selected_ingredients: List[ParsedIngredient],
+                          preferences: Dict) -> Dict[str, Any]:
+        """Рецепт из локального каталога, для которого есть хотя бы часть продуктов
+        (недостающие показываются пользователю), а если такого нет - адаптированный
+        шаблон из выбранных ингредиентов"""
+        recipe = recipe_engine.find(ingredients, preferences, config.LOCAL_RECIPE_FALLBACK_COVERAGE)
+        if recipe:
+            print(f"✅ Подобран локальный рецепт: {recipe['title']}")
+            return recipe
         return self._get_adapted_recipe(selected_ingredients)
     
-    def _get_adapted_recipe(self, ingredients: List[str]) -> Dict[str, Any]:
+    def _get_adapted_recipe(self, ingredients: List[ParsedIngredient]) -> Dict[str, Any]:
         """Создает адаптированный рецепт на основе выбранных ингредиентов"""
-        # Создаем список ингредиентов для рецепта
-        adapted_ingredients = []
-        for ing in ingredients:
-            # Парсим количество из исходного формата
-            if " " in ing:
-                parts = ing.split(" ")
-                if len(parts) >= 2:
-                    name = parts[0]
-                    quantity = " ".join(parts[1:])
-                    adapted_ingredients.append(f"{name} - {quantity}")
-                else:
-                    adapted_ingredients.append(f"{ing} - по вкусу")
-            else:
-                adapted_ingredients.append(f"{ing} - по вкусу")
+        # Количество уже разобрано при добавлении продукта
+        adapted_ingredients = [f"{item.name} - {item.quantity or 'по вкусу'}" for item in ingredients]
         
         # Добавляем базовые специи
         adapted_ingredients.extend(["Соль - по вкусу", "Перец - по вкусу", "Растительное масло - 2 ст.л."])
         
         # Определяем тип блюда по выбранным ингредиентам
-        ingredient_text = " ".join(ingredients).lower()
+        ingredient_text = " ".join(item.canonical_name for item in ingredients)
         
         if any(word in ingredient_text for word in ["яйц", "омлет"]):
             title = "🍳 Омлет с выбранными ингредиентами"
@@ -388,42 +492,40 @@ class ChefAgent:
         }
     
     async def save_recipe(self, db: AsyncSession, user_id: int, recipe_data: Dict) -> int:
-        """Сохраняет рецепт в базу данных"""
+        """Сохраняет рецепт в историю пользователя; одинаковый текст рецепта хранится один раз"""
         try:
-            from models import Recipe
-            recipe = Recipe(
-                user_id=user_id,
-                title=recipe_data["title"],
-                ingredients=recipe_data["ingredients"],
-                instructions="\n".join(recipe_data["instructions"]),
-                cooking_time=recipe_data["cooking_time"],
-                difficulty=recipe_data["difficulty"]
-            )
-            db.add(recipe)
+            recipe_id = await save_user_recipe(db, user_id, recipe_data, ingredient_keys(recipe_data["ingredients"]))
             await db.commit()
-            await db.refresh(recipe)
-            return recipe.id
+            return recipe_id
         except Exception as e:
             print(f"❌ Ошибка при сохранении рецепта: {e}")
+            await db.rollback()
             return 0
     
-    async def process_user_request(self, db: AsyncSession, user_id: int, message: str) -> str:
+    def format_recipe(self, recipe: Dict[str, Any]) -> str:
+        """Текст рецепта для Telegram (Markdown)"""
+        response = f"🍴 *{recipe['title']}*\n\n"
+        response += "🥕 *Ингредиенты:*\n" + "\n".join(f"• {ing}" for ing in recipe['ingredients']) + "\n\n"
+        if recipe.get('missing'):
+            response += "🛒 *Нужно докупить:* " + ", ".join(recipe['missing']) + "\n\n"
+        response += "👨‍🍳 *Приготовление:*\n" + "\n".join(recipe['instructions']) + "\n\n"
+        response += f"⏱ *Время:* {recipe['cooking_time']} мин\n"
+        response += f"📊 *Сложность:* {recipe['difficulty']}\n"
+        return response
+    
+    async def process_user_request(self, db: AsyncSession, user_id: int, message: str,
+                                   on_progress: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
         """Основной метод обработки запросов"""
         try:
-            fridge_items = await self.analyze_fridge(db, user_id)
+            context = await self.load_user_context(db, user_id)
             
-            if not fridge_items:
+            if not context.fridge_items:
                 return "😔 Ваш холодильник пуст. Добавьте продукты через меню '🥕 Мой холодильник'!"
             
-            preferences = await self.get_user_preferences(db, user_id)
-            recipe = await self.create_recipe(fridge_items, preferences)
+            recipe = await self.create_recipe(list(context.fridge_items), context.preferences, db, on_progress, user_id)
             recipe_id = await self.save_recipe(db, user_id, recipe)
             
-            response = f"🍴 *{recipe['title']}*\n\n"
-            response += "🥕 *Ингредиенты:*\n" + "\n".join(f"• {ing}" for ing in recipe['ingredients']) + "\n\n"
-            response += "👨‍🍳 *Приготовление:*\n" + "\n".join(recipe['instructions']) + "\n\n"
-            response += f"⏱ *Время:* {recipe['cooking_time']} мин\n"
-            response += f"📊 *Сложность:* {recipe['difficulty']}\n"
+            response = self.format_recipe(recipe)
             
             if recipe_id:
                 response += f"\n📝 Рецепт сохранен под номером #{recipe_id}"
@@ -1,21 +1,48 @@
 import asyncio
 import os
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy import text
+from aiogram.fsm.storage.memory import MemoryStorage
 
 from models import User, FridgeItem, Recipe
 
 from config import config
 from agent import chef_agent
-from database import get_db, init_db
+from database import AsyncSessionLocal, init_db
+from middlewares import DbSessionMiddleware, LazySession, ThrottlingMiddleware
+from fsm_storage import DbStorage
+from streaming import ProgressiveMessage
+from user_cache import user_cache
+from rate_limit import user_limiter
+from fridge_import import add_fridge_items, parse_document, parse_shopping_list
+from job_queue import recipe_queue, QueuedJob, DUPLICATE, FULL
+from speculation import speculator
+from recipe_history import RecipePage, SearchPage, get_recipe, list_recipes, search_recipes
 
 
-bot = Bot(token=config.BOT_TOKEN)
-dp = Dispatcher()
+def _create_bot_session():
+    # Отдельный адрес Bot API нужен для локального сервера или fake_telegram.py
+    if config.TELEGRAM_API_URL:
+        return AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    return None
+
+def _create_fsm_storage():
+    # Несколько воркеров в режиме webhook должны видеть общее состояние диалогов
+    if config.FSM_STORAGE == "db":
+        return DbStorage(AsyncSessionLocal)
+    return MemoryStorage()
+
+bot = Bot(token=config.BOT_TOKEN, session=_create_bot_session())
+dp = Dispatcher(storage=_create_fsm_storage())
+# Сессия БД создается только в тех обработчиках, которые к ней обращаются
+dp.update.outer_middleware(DbSessionMiddleware(AsyncSessionLocal))
+dp.message.middleware(ThrottlingMiddleware(user_limiter))
 
 # Клавиатуры
 main_keyboard = ReplyKeyboardMarkup(
@@ -38,31 +65,29 @@ class FridgeState(StatesGroup):
     waiting_for_ingredient = State()
 
 @dp.message(Command("start"))
-async def cmd_start(message: types.Message):
+async def cmd_start(message: types.Message, db: LazySession):
     """Обработчик команды /start"""
     print(f"🔔 Получена команда /start от пользователя {message.from_user.id}")
     
-    async for session in get_db():
-        # Регистрируем пользователя
-        result = await session.execute(
-            text("SELECT * FROM users WHERE telegram_id = :user_id"),
-            {"user_id": message.from_user.id}
+    session = db.session
+    # Регистрируем пользователя
+    user = await chef_agent.get_user_profile(session, message.from_user.id)
+    
+    if not user:
+        print(f"👤 Создаем нового пользователя: {message.from_user.id}")
+        user = User(
+            telegram_id=message.from_user.id,
+            username=message.from_user.username,
+            first_name=message.from_user.first_name,
+            last_name=message.from_user.last_name
         )
-        user = result.first()
-        
-        if not user:
-            print(f"👤 Создаем нового пользователя: {message.from_user.id}")
-            user = User(
-                telegram_id=message.from_user.id,
-                username=message.from_user.username,
-                first_name=message.from_user.first_name,
-                last_name=message.from_user.last_name
-            )
-            session.add(user)
-            await session.commit()
-            print(f"✅ Пользователь создан: {message.from_user.id}")
-        else:
-            print(f"✅ Пользователь уже существует: {message.from_user.id}")
+        session.add(user)
+        await user_cache.notify_profile(session, message.from_user.id)
+        await session.commit()
+        user_cache.invalidate_profile(message.from_user.id)
+        print(f"✅ Пользователь создан: {message.from_user.id}")
+    else:
+        print(f"✅ Пользователь уже существует: {message.from_user.id}")
     
     welcome_text = """
 👨‍🍳 Привет! Я твой личный шеф-повар!
@@ -71,27 +96,49 @@ async def cmd_start(message: types.Message):
 • Создать рецепт из того, что есть в холодильнике
 • Учитывать твои диетические предпочтения
 • Сохранять твои любимые рецепты
+• Искать по сохраненным рецептам: /search курица, /with яйца, сыр
 
 Выбери действие ниже!
 """
     print(f"📤 Отправляю приветствие пользователю {message.from_user.id}")
     await message.answer(welcome_text, reply_markup=main_keyboard)
 
-@dp.message(F.text == "🍴 Создать рецепт")
+@dp.message(F.text == "🍴 Создать рецепт", flags={"llm": True})
 async def create_recipe(message: types.Message):
-    """Создание рецепта"""
+    """Создание рецепта: ставим задачу в очередь и сразу отвечаем заглушкой"""
     print(f"🔔 Пользователь {message.from_user.id} запросил создание рецепта")
-    async for session in get_db():
-        try:
+    try:
+        placeholder = await message.answer("👨‍🍳 Готовлю рецепт...")
+        status = await recipe_queue.enqueue(message.from_user.id, placeholder.chat.id, placeholder.message_id)
+        if status == DUPLICATE:
+            await placeholder.edit_text("⏳ Предыдущий рецепт еще готовится, подождите немного.")
+        elif status == FULL:
+            await placeholder.edit_text("😔 Сейчас слишком много запросов. Попробуйте через пару минут.")
+    except Exception as e:
+        print(f"❌ Ошибка при создании рецепта: {e}")
+        await message.answer("😔 Произошла ошибка при создании рецепта. Попробуйте снова.", reply_markup=main_keyboard)
+
+async def deliver_recipe(job: QueuedJob):
+    """Генерирует рецепт для задачи из очереди и дописывает его в сообщение-заглушку"""
+    progress = ProgressiveMessage(bot, job.chat_id, job.message_id, config.STREAM_EDIT_INTERVAL)
+    try:
+        # Если рецепт для этого холодильника уже генерируется заранее, забираем его
+        await speculator.join(job.user_id)
+        async with AsyncSessionLocal() as session:
             response = await chef_agent.process_user_request(
                 session, 
-                message.from_user.id, 
-                "создай рецепт"
+                job.user_id, 
+                "создай рецепт",
+                on_progress=progress.update if config.STREAM_RECIPES else None
             )
-            await message.answer(response, reply_markup=main_keyboard, parse_mode="Markdown")
-        except Exception as e:
-            print(f"❌ Ошибка при создании рецепта: {e}")
-            await message.answer("😔 Произошла ошибка при создании рецепта. Попробуйте снова.", reply_markup=main_keyboard)
+        await progress.finish(response, parse_mode="Markdown")
+    except Exception as e:
+        print(f"❌ Ошибка при создании рецепта: {e}")
+        await bot.edit_message_text(
+            "😔 Произошла ошибка при создании рецепта. Попробуйте снова.",
+            chat_id=job.chat_id,
+            message_id=job.message_id
+        )
 
 @dp.message(F.text == "🥕 Мой холодильник")
 async def my_fridge(message: types.Message):
@@ -102,21 +149,21 @@ async def my_fridge(message: types.Message):
     )
 
 @dp.message(F.text == "📋 Список продуктов")
-async def list_fridge_items(message: types.Message):
+async def list_fridge_items(message: types.Message, db: LazySession):
     print(f"🔔 Пользователь {message.from_user.id} запросил список продуктов")
-    async for session in get_db():
-        try:
-            items = await chef_agent.analyze_fridge(session, message.from_user.id)
-            
-            if items:
-                response = "🥕 В вашем холодильнике:\n" + "\n".join(f"• {item}" for item in items)
-            else:
-                response = "😔 Холодильник пуст. Добавьте продукты!"
-            
-            await message.answer(response, reply_markup=fridge_keyboard)
-        except Exception as e:
-            print(f"❌ Ошибка при получении списка продуктов: {e}")
-            await message.answer("😔 Произошла ошибка при загрузке списка продуктов.", reply_markup=fridge_keyboard)
+    session = db.session
+    try:
+        items = await chef_agent.analyze_fridge(session, message.from_user.id)
+        
+        if items:
+            response = "🥕 В вашем холодильнике:\n" + "\n".join(f"• {item}" for item in items)
+        else:
+            response = "😔 Холодильник пуст. Добавьте продукты!"
+        
+        await message.answer(response, reply_markup=fridge_keyboard)
+    except Exception as e:
+        print(f"❌ Ошибка при получении списка продуктов: {e}")
+        await message.answer("😔 Произошла ошибка при загрузке списка продуктов.", reply_markup=fridge_keyboard)
 
 @dp.message(F.text == "➕ Добавить продукт")
 async def add_ingredient_start(message: types.Message, state: FSMContext):
@@ -126,109 +173,296 @@ async def add_ingredient_start(message: types.Message, state: FSMContext):
         "Например:\n"
         "• помидоры 3 шт\n"
         "• куриное филе 400г\n"
-        "• яйца 5 шт",
+        "• яйца 5 шт\n\n"
+        "Можно прислать сразу весь список покупок - по продукту на строку, "
+        "или файл .txt/.csv",
         reply_markup=types.ReplyKeyboardRemove()
     )
     await state.set_state(FridgeState.waiting_for_ingredient)
 
+async def save_fridge_items(message: types.Message, session, items: list, truncated: bool = False):
+    """Сохраняет разобранные продукты одной транзакцией и сообщает пользователю результат.
+    truncated - список длиннее FRIDGE_IMPORT_MAX_ITEMS и хвост не добавлен"""
+    added = set(await add_fridge_items(session, message.from_user.id, items))
+    if added:
+        await user_cache.notify_fridge(session, message.from_user.id)
+    await session.commit()
+    if added:
+        user_cache.invalidate_fridge(message.from_user.id)
+        if config.SPECULATIVE_RECIPES:
+            speculator.schedule(message.from_user.id)
+    
+    added_items = [item.label for item in items if item.canonical_name in added]
+    existing_items = [item.label for item in items if item.canonical_name not in added]
+    print(f"✅ Пользователь {message.from_user.id} добавил продуктов: {len(added_items)}, уже были: {len(existing_items)}")
+    
+    if len(items) == 1:
+        response = f"✅ Добавлено: {added_items[0]}" if added_items else f"ℹ️ {existing_items[0]} уже есть в холодильнике"
+    else:
+        response = f"✅ Добавлено продуктов: {len(added_items)}"
+        if added_items:
+            response += "\n" + "\n".join(f"• {label}" for label in added_items)
+        if existing_items:
+            response += "\n\nℹ️ Уже были в холодильнике: " + ", ".join(existing_items)
+    if truncated:
+        response += (
+            f"\n\n⚠️ За один раз можно добавить не больше {config.FRIDGE_IMPORT_MAX_ITEMS} продуктов, "
+            "остальные не добавлены. Пришлите их отдельным сообщением."
+        )
+    await message.answer(response, reply_markup=fridge_keyboard)
+
+@dp.message(FridgeState.waiting_for_ingredient, F.document)
+async def add_ingredients_from_file(message: types.Message, state: FSMContext, db: LazySession):
+    document = message.document
+    print(f"🔔 Пользователь {message.from_user.id} загрузил список продуктов: {document.file_name}")
+    await state.clear()
+    
+    if not (document.file_name or "").lower().endswith((".txt", ".csv")):
+        await message.answer("❌ Поддерживаются только файлы .txt и .csv.", reply_markup=fridge_keyboard)
+        return
+    if document.file_size and document.file_size > config.FRIDGE_IMPORT_MAX_BYTES:
+        await message.answer("❌ Файл слишком большой.", reply_markup=fridge_keyboard)
+        return
+    
+    try:
+        data = await bot.download(document)
+        items, truncated = parse_document(document.file_name, data.read(), config.FRIDGE_IMPORT_MAX_ITEMS)
+        if not items:
+            await message.answer("❌ В файле не нашлось продуктов.", reply_markup=fridge_keyboard)
+            return
+        await save_fridge_items(message, db.session, items, truncated)
+    except Exception as e:
+        print(f"❌ Ошибка при импорте продуктов: {e}")
+        await message.answer(
+            "❌ Произошла ошибка при добавлении продуктов. Попробуйте снова.",
+            reply_markup=fridge_keyboard
+        )
+
 @dp.message(FridgeState.waiting_for_ingredient)
-async def add_ingredient_finish(message: types.Message, state: FSMContext):
+async def add_ingredient_finish(message: types.Message, state: FSMContext, db: LazySession):
     print(f"🔔 Пользователь {message.from_user.id} добавил продукт: {message.text}")
+    await state.clear()
     
     if not message.text or len(message.text.strip()) == 0:
         await message.answer("❌ Пожалуйста, введите название продукта.", reply_markup=fridge_keyboard)
-        await state.clear()
         return
     
-    async for session in get_db():
-        try:
-            # Простая обработка ввода
-            ingredient_text = message.text.strip()
-            
-            fridge_item = FridgeItem(
-                user_id=message.from_user.id,
-                ingredient_name=ingredient_text,
-                quantity="",
-                category="другое"
-            )
-            session.add(fridge_item)
-            await session.commit()
-            
-            await message.answer(
-                f"✅ Добавлено: {ingredient_text}",
-                reply_markup=fridge_keyboard
-            )
-            print(f"✅ Продукт добавлен в БД: {ingredient_text}")
-            
-        except Exception as e:
-            print(f"❌ Ошибка при добавлении продукта: {e}")
-            await message.answer(
-                "❌ Произошла ошибка при добавлении продукта. Попробуйте снова.",
-                reply_markup=fridge_keyboard
-            )
+    # Разбираем ввод один раз: название, количество в базовых единицах и категория.
+    # Несколько строк - это список покупок, он сохраняется одним запросом
+    items, truncated = parse_shopping_list(message.text, config.FRIDGE_IMPORT_MAX_ITEMS)
+    if not items:
+        await message.answer("❌ Не удалось распознать название продукта.", reply_markup=fridge_keyboard)
+        return
     
-    await state.clear()
+    try:
+        await save_fridge_items(message, db.session, items, truncated)
+    except Exception as e:
+        print(f"❌ Ошибка при добавлении продукта: {e}")
+        await message.answer(
+            "❌ Произошла ошибка при добавлении продукта. Попробуйте снова.",
+            reply_markup=fridge_keyboard
+        )
 
 @dp.message(F.text == "🔙 Назад")
 async def back_to_main(message: types.Message):
     print(f"🔔 Пользователь {message.from_user.id} вернулся в главное меню")
     await message.answer("Главное меню:", reply_markup=main_keyboard)
 
+class RecipePageCallback(CallbackData, prefix="rp"):
+    direction: str
+    cursor: str
+
+class RecipeViewCallback(CallbackData, prefix="rv"):
+    recipe_id: int
+
+class SearchPageCallback(CallbackData, prefix="sp"):
+    offset: int
+
+def _recipe_buttons(items: list) -> list:
+    return [
+        [InlineKeyboardButton(
+            text=f"{item['title'][:48]} (#{item['id']})",
+            callback_data=RecipeViewCallback(recipe_id=item["id"]).pack()
+        )]
+        for item in items
+    ]
+
+def recipe_page_keyboard(page: RecipePage) -> InlineKeyboardMarkup:
+    """Кнопка на каждый рецепт страницы и навигация по истории"""
+    rows = _recipe_buttons(page.items)
+    navigation = []
+    if page.prev_cursor:
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Новее", callback_data=RecipePageCallback(direction="prev", cursor=page.prev_cursor).pack()
+        ))
+    if page.next_cursor:
+        navigation.append(InlineKeyboardButton(
+            text="Старее ▶️", callback_data=RecipePageCallback(direction="next", cursor=page.next_cursor).pack()
+        ))
+    if navigation:
+        rows.append(navigation)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
 @dp.message(F.text == "📖 Мои рецепты")
-async def my_recipes(message: types.Message):
+async def my_recipes(message: types.Message, db: LazySession):
     print(f"🔔 Пользователь {message.from_user.id} запросил свои рецепты")
-    async for session in get_db():
-        try:
-            result = await session.execute(
-                text("SELECT * FROM recipes WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 5"),
-                {"user_id": message.from_user.id}
+    session = db.session
+    try:
+        page = await list_recipes(session, message.from_user.id, config.RECIPE_PAGE_SIZE)
+        
+        if page.items:
+            await message.answer("📖 Ваши рецепты:", reply_markup=recipe_page_keyboard(page))
+        else:
+            await message.answer(
+                "📝 У вас пока нет сохраненных рецептов. Создайте первый через меню '🍴 Создать рецепт'!",
+                reply_markup=main_keyboard
             )
-            recipes = result.fetchall()
-            
-            if recipes:
-                response = "📖 Ваши последние рецепты:\n\n"
-                for recipe in recipes:
-                    response += f"• {recipe.title} (#{recipe.id})\n"
-            else:
-                response = "📝 У вас пока нет сохраненных рецептов. Создайте первый через меню '🍴 Создать рецепт'!"
-            
-            await message.answer(response, reply_markup=main_keyboard)
-        except Exception as e:
-            print(f"❌ Ошибка при получении рецептов: {e}")
-            await message.answer("😔 Произошла ошибка при загрузке рецептов.", reply_markup=main_keyboard)
+    except Exception as e:
+        print(f"❌ Ошибка при получении рецептов: {e}")
+        await message.answer("😔 Произошла ошибка при загрузке рецептов.", reply_markup=main_keyboard)
+
+@dp.callback_query(RecipePageCallback.filter())
+async def recipes_page(callback: types.CallbackQuery, callback_data: RecipePageCallback, db: LazySession):
+    """Листает историю рецептов в том же сообщении"""
+    try:
+        cursor = callback_data.cursor
+        page = await list_recipes(
+            db.session,
+            callback.from_user.id,
+            config.RECIPE_PAGE_SIZE,
+            after=cursor if callback_data.direction == "next" else None,
+            before=cursor if callback_data.direction == "prev" else None
+        )
+        if not page.items:
+            await callback.answer("Больше рецептов нет")
+            return
+        await callback.message.edit_reply_markup(reply_markup=recipe_page_keyboard(page))
+        await callback.answer()
+    except Exception as e:
+        print(f"❌ Ошибка при листании рецептов: {e}")
+        await callback.answer("😔 Не удалось загрузить рецепты.")
+
+def search_page_keyboard(page: SearchPage, offset: int) -> InlineKeyboardMarkup:
+    rows = _recipe_buttons(page.items)
+    navigation = []
+    if offset > 0:
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=SearchPageCallback(offset=max(0, offset - config.RECIPE_PAGE_SIZE)).pack()
+        ))
+    if page.next_offset is not None:
+        navigation.append(InlineKeyboardButton(
+            text="Еще ▶️", callback_data=SearchPageCallback(offset=page.next_offset).pack()
+        ))
+    if navigation:
+        rows.append(navigation)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def _run_search(message: types.Message, state: FSMContext, db: LazySession,
+                      query: str = None, ingredients: list = None):
+    # Запрос сохраняем в данных FSM: в callback_data он может не поместиться
+    await state.update_data(recipe_search={"query": query, "ingredients": ingredients})
+    page = await search_recipes(
+        db.session, message.from_user.id, query, ingredients, config.RECIPE_PAGE_SIZE
+    )
+    if page.items:
+        await message.answer("🔎 Найденные рецепты:", reply_markup=search_page_keyboard(page, 0))
+    else:
+        await message.answer("😔 Ничего не нашлось среди ваших рецептов.", reply_markup=main_keyboard)
+
+@dp.message(Command("search"))
+async def search_command(message: types.Message, command: CommandObject, state: FSMContext, db: LazySession):
+    """Поиск по названию, ингредиентам и шагам сохраненных рецептов: /search курица с рисом"""
+    print(f"🔔 Пользователь {message.from_user.id} ищет рецепты: {command.args}")
+    if not command.args:
+        await message.answer("Напишите, что искать, например: /search курица с рисом")
+        return
+    try:
+        await _run_search(message, state, db, query=command.args.strip())
+    except Exception as e:
+        print(f"❌ Ошибка поиска рецептов: {e}")
+        await message.answer("😔 Произошла ошибка при поиске рецептов.", reply_markup=main_keyboard)
+
+@dp.message(Command("with"))
+async def search_by_ingredients_command(message: types.Message, command: CommandObject, state: FSMContext,
+                                        db: LazySession):
+    """Рецепты, в которых есть все перечисленные продукты: /with яйца, помидоры"""
+    print(f"🔔 Пользователь {message.from_user.id} ищет рецепты с продуктами: {command.args}")
+    ingredients = [name.strip() for name in (command.args or "").split(",") if name.strip()]
+    if not ingredients:
+        await message.answer("Перечислите продукты через запятую, например: /with яйца, помидоры")
+        return
+    try:
+        await _run_search(message, state, db, ingredients=ingredients)
+    except Exception as e:
+        print(f"❌ Ошибка поиска рецептов: {e}")
+        await message.answer("😔 Произошла ошибка при поиске рецептов.", reply_markup=main_keyboard)
+
+@dp.callback_query(SearchPageCallback.filter())
+async def search_page(callback: types.CallbackQuery, callback_data: SearchPageCallback, state: FSMContext,
+                      db: LazySession):
+    try:
+        search = (await state.get_data()).get("recipe_search")
+        if not search:
+            await callback.answer("Поиск устарел, повторите запрос")
+            return
+        page = await search_recipes(
+            db.session, callback.from_user.id, search["query"], search["ingredients"],
+            config.RECIPE_PAGE_SIZE, callback_data.offset
+        )
+        if not page.items:
+            await callback.answer("Больше рецептов нет")
+            return
+        await callback.message.edit_reply_markup(reply_markup=search_page_keyboard(page, callback_data.offset))
+        await callback.answer()
+    except Exception as e:
+        print(f"❌ Ошибка при листании результатов поиска: {e}")
+        await callback.answer("😔 Не удалось загрузить рецепты.")
+
+@dp.callback_query(RecipeViewCallback.filter())
+async def show_recipe(callback: types.CallbackQuery, callback_data: RecipeViewCallback, db: LazySession):
+    """Полный текст рецепта загружается только при нажатии на него"""
+    try:
+        recipe = await get_recipe(db.session, callback.from_user.id, callback_data.recipe_id)
+        if not recipe:
+            await callback.answer("Рецепт не найден", show_alert=True)
+            return
+        await callback.message.answer(
+            chef_agent.format_recipe(recipe) + f"\n📝 Рецепт #{recipe['id']}",
+            parse_mode="Markdown"
+        )
+        await callback.answer()
+    except Exception as e:
+        print(f"❌ Ошибка при загрузке рецепта: {e}")
+        await callback.answer("😔 Не удалось загрузить рецепт.")
 
 #пока нет
 @dp.message(F.text == "👤 Мой профиль")
-async def my_profile(message: types.Message):
+async def my_profile(message: types.Message, db: LazySession):
     print(f"🔔 Пользователь {message.from_user.id} запросил профиль")
     
-    async for session in get_db():
-        try:
-            result = await session.execute(
-                text("SELECT * FROM users WHERE telegram_id = :user_id"),
-                {"user_id": message.from_user.id}
-            )
-            user = result.first()
-            
-            if user:
-                response = f"👤 *Ваш профиль:*\n\n"
-                response += f"🆔 ID: {user.telegram_id}\n"
-                response += f"👤 Имя: {user.first_name or 'Не указано'}\n"
-                response += f"📛 Фамилия: {user.last_name or 'Не указана'}\n"
-                response += f"📱 Username: @{user.username or 'Не указан'}\n"
-                response += f"🍽️ Предпочтения: {', '.join(user.dietary_preferences) if user.dietary_preferences else 'Не указаны'}\n"
-                response += f"🚫 Аллергии: {', '.join(user.allergies) if user.allergies else 'Нет'}\n"
-                response += f"👨‍🍳 Уровень: {user.cooking_skill}\n"
-                response += f"📅 Зарегистрирован: {user.created_at.strftime('%d.%m.%Y') if user.created_at else 'Неизвестно'}\n\n"
-                response += "⚙️ *Настройки профиля скоро будут доступны*"
-            else:
-                response = "❌ Профиль не найден. Отправьте /start"
-            
-            await message.answer(response, reply_markup=main_keyboard, parse_mode="Markdown")
-            
-        except Exception as e:
-            print(f"❌ Ошибка при получении профиля: {e}")
-            await message.answer("😔 Произошла ошибка при загрузке профиля.", reply_markup=main_keyboard)
+    session = db.session
+    try:
+        user = await chef_agent.get_user_profile(session, message.from_user.id)
+        
+        if user:
+            response = f"👤 *Ваш профиль:*\n\n"
+            response += f"🆔 ID: {user.telegram_id}\n"
+            response += f"👤 Имя: {user.first_name or 'Не указано'}\n"
+            response += f"📛 Фамилия: {user.last_name or 'Не указана'}\n"
+            response += f"📱 Username: @{user.username or 'Не указан'}\n"
+            response += f"🍽️ Предпочтения: {', '.join(user.dietary_preferences) if user.dietary_preferences else 'Не указаны'}\n"
+            response += f"🚫 Аллергии: {', '.join(user.allergies) if user.allergies else 'Нет'}\n"
+            response += f"👨‍🍳 Уровень: {user.cooking_skill}\n"
+            response += f"📅 Зарегистрирован: {user.created_at.strftime('%d.%m.%Y') if user.created_at else 'Неизвестно'}\n\n"
+            response += "⚙️ *Настройки профиля скоро будут доступны*"
+        else:
+            response = "❌ Профиль не найден. Отправьте /start"
+        
+        await message.answer(response, reply_markup=main_keyboard, parse_mode="Markdown")
+        
+    except Exception as e:
+        print(f"❌ Ошибка при получении профиля: {e}")
+        await message.answer("😔 Произошла ошибка при загрузке профиля.", reply_markup=main_keyboard)
 
 # Обработчик для всех остальных сообщений
 @dp.message()
@@ -263,4 +497,35 @@ async def start_bot():
         print("🔄 Начинаем обработку сообщений...")
         await dp.start_polling(bot)
     except Exception as e:
-        print(f"❌ Ошибка запуска бота: {e}")
\ No newline at end of file
+        print(f"❌ Ошибка запуска бота: {e}")
+
+async def setup_webhook():
+    """Регистрирует вебхук в Telegram, если он еще не указывает на этот сервис"""
+    if not config.WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET не задан: вебхук без секрета принимал бы чужие обновления")
+    
+    if config.RECIPE_QUEUE_BACKEND != "db" or config.FSM_STORAGE != "db":
+        print("⚠️ Вебхук на нескольких воркерах требует RECIPE_QUEUE_BACKEND=db и FSM_STORAGE=db")
+    
+    if not config.WEBHOOK_SET_ON_STARTUP:
+        print("ℹ️ Регистрация вебхука при запуске отключена")
+        return
+    if not config.WEBHOOK_BASE_URL:
+        raise RuntimeError("WEBHOOK_BASE_URL не задан: не на что регистрировать вебхук")
+    
+    url = config.WEBHOOK_BASE_URL.rstrip("/") + config.WEBHOOK_PATH
+    try:
+        # Вебхук мог уже настроить другой воркер - повторная регистрация не нужна
+        info = await bot.get_webhook_info()
+        if info.url == url:
+            print(f"✅ Вебхук уже настроен: {url}")
+            return
+        
+        await bot.set_webhook(
+            url,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        print(f"✅ Вебхук установлен: {url}")
+    except Exception as e:
+        print(f"❌ Ошибка настройки вебхука: {e}")
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import LRUCache
+from config import config
+from recipe_cache import normalize_ingredient
+
+class _Node:
+    __slots__ = ("children", "fail", "matches")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.fail: Optional["_Node"] = None
+        # Совпадения, заканчивающиеся в этом узле, от самого длинного ключа к короткому:
+        # (длина ключа, -приоритет, категория)
+        self.matches: Tuple[Tuple[int, int, str], ...] = ()
+
+class Categorizer:
+    """Определяет категорию продукта автоматом Ахо-Корасик по ключевым основам из таксономии.
+    Основа засчитывается только с начала слова: "нут" находится в "нут", но не в "минут".
+    При нескольких совпадениях побеждает самое длинное ключевое слово ("томатная паста" -
+    бакалея, а не гарнир; "печенье" - сладости, а не "печень"), при равной длине - категория,
+    стоящая в таксономии раньше"""
+
+    def __init__(self, categories: List[Dict[str, Any]], default: str):
+        self.default = default
+        self.categories = [category["name"] for category in categories]
+        if default not in self.categories:
+            self.categories.append(default)
+        self._root = _Node()
+        self._memo = LRUCache(max_entries=50000, ttl=float("inf"))
+
+        for priority, category in enumerate(categories):
+            for keyword in category["keywords"]:
+                self._add(normalize_ingredient(keyword), priority, category["name"])
+        self._build_fail_links()
+
+    def _add(self, keyword: str, priority: int, category: str):
+        if not keyword:
+            return
+        node = self._root
+        for char in keyword:
+            node = node.children.setdefault(char, _Node())
+        match = (len(keyword), -priority, category)
+        if not node.matches or match > node.matches[0]:
+            node.matches = (match,)
+
+    def _build_fail_links(self):
+        queue = deque()
+        for child in self._root.children.values():
+            child.fail = self._root
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in node.children.items():
+                fail = node.fail
+                while fail is not None and char not in fail.children:
+                    fail = fail.fail
+                child.fail = fail.children[char] if fail is not None else self._root
+                # Узел наследует совпадения своего суффикса, чтобы при поиске не ходить по fail-ссылкам.
+                # Ключи суффикса короче, поэтому порядок от длинного к короткому сохраняется
+                child.matches = child.matches + child.fail.matches
+                queue.append(child)
+
+    @classmethod
+    def load(cls, path: str) -> "Categorizer":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            categorizer = cls(data["categories"], data.get("default", "бакалея"))
+            print(f"✅ Загружена таксономия продуктов: {len(categorizer.categories)} категорий")
+            return categorizer
+        except Exception as e:
+            print(f"❌ Не удалось загрузить таксономию продуктов из {path}: {e}")
+            return cls([], "бакалея")
+
+    def _scan(self, name: str) -> str:
+        node = self._root
+        best = None
+        for end, char in enumerate(name, 1):
+            while node is not self._root and char not in node.children:
+                node = node.fail
+            node = node.children.get(char, self._root)
+            for match in node.matches:
+                start = end - match[0]
+                if start == 0 or not name[start - 1].isalpha():
+                    if best is None or match > best:
+                        best = match
+                    break
+        return best[2] if best else self.default
+
+    def categorize(self, ingredient: str) -> str:
+        """Категория продукта; результат запоминается для канонического названия"""
+        name = normalize_ingredient(ingredient)
+        category = self._memo.get(name)
+        if category is None:
+            category = self._scan(name)
+            self._memo.set(name, category)
+        return category
+
+    def stats(self) -> Dict[str, Any]:
+        return self._memo.stats()
+
+categorizer = Categorizer.load(config.TAXONOMY_PATH)
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен: сервис недавно отказывал и еще не восстановился"""
+
+class CircuitBreaker:
+    """Размыкает цепь, когда доля ошибок в последних window вызовах превышает error_rate.
+    Через open_seconds пропускает пробный вызов: успех замыкает цепь, ошибка снова размыкает.
+    Заодно подбирает таймаут по p95 задержки успешных вызовов"""
+
+    def __init__(self, name: str, window: int, min_calls: int, error_rate: float, open_seconds: float,
+                 min_timeout: float, max_timeout: float, timeout_factor: float):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Цепь разомкнута и время пробного вызова еще не наступило"""
+        return self.state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def allow_request(self) -> bool:
+        if self.state == OPEN and not self.is_open:
+            self.state = HALF_OPEN
+            print(f"🔄 Пробный запрос к {self.name}")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self, latency: float):
+        self._latencies.append(latency)
+        if self.state == OPEN:
+            # Запрос, начатый до размыкания, не должен замыкать цепь без пробы
+            return
+        if self.state == HALF_OPEN:
+            print(f"✅ {self.name} снова отвечает, цепь замкнута")
+            self.state = CLOSED
+            self._probe_in_flight = False
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == OPEN:
+            return
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate() >= self.error_rate:
+            self._open()
+
+    def _open(self):
+        print(f"⚠️ {self.name} отказывает, цепь разомкнута на {self.open_seconds:.0f} сек.")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.opened += 1
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def timeout(self) -> float:
+        """Таймаут вызова: p95 задержки с запасом, в пределах [min_timeout, max_timeout]"""
+        if len(self._latencies) < self.min_calls:
+            return self.max_timeout
+        adaptive = self.latency_percentile(0.95) * self.timeout_factor
+        return max(self.min_timeout, min(self.max_timeout, adaptive))
+
+    @asynccontextmanager
+    async def guard(self):
+        """Оборачивает один вызов сервиса и учитывает его результат"""
+        if not self.allow_request():
+            raise CircuitOpenError()
+        started_at = time.monotonic()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            # Вызов прервали мы сами - это не говорит о состоянии сервиса
+            self._probe_in_flight = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        else:
+            self.record_success(time.monotonic() - started_at)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 3),
+            "p50_latency_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "timeout_s": round(self.timeout(), 1),
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
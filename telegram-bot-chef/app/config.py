@@ -5,11 +5,91 @@ load_dotenv()
 
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
+    # polling - один процесс опрашивает Telegram; webhook - обновления приходят в FastAPI
+    # и могут обрабатываться несколькими воркерами uvicorn. Для нескольких воркеров нужны
+    # FSM_STORAGE=db и RECIPE_QUEUE_BACKEND=db: состояния и очередь в памяти у каждого процесса свои
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    WEBHOOK_SET_ON_STARTUP = os.getenv("WEBHOOK_SET_ON_STARTUP", "true").lower() == "true"
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
     DATABASE_URL = os.getenv("DATABASE_URL")
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     GIGACHAT_CLIENT_ID = os.getenv("GIGACHAT_CLIENT_ID")
     GIGACHAT_CLIENT_SECRET = os.getenv("GIGACHAT_CLIENT_SECRET")
     GIGACHAT_SCOPE = os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
+    GIGACHAT_TIMEOUT = float(os.getenv("GIGACHAT_TIMEOUT", 60))
+    GIGACHAT_MAX_CONCURRENCY = int(os.getenv("GIGACHAT_MAX_CONCURRENCY", 100))
+    GIGACHAT_MAX_CONNECTIONS = int(os.getenv("GIGACHAT_MAX_CONNECTIONS", 100))
+    GIGACHAT_MAX_KEEPALIVE = int(os.getenv("GIGACHAT_MAX_KEEPALIVE", 20))
+    # Бюджет токенов на запрос к GigaChat: длинный список продуктов сокращается
+    PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", 1500))
+    # Общий лимит запросов к GigaChat в секунду (0 - без ограничения)
+    GIGACHAT_QPS = float(os.getenv("GIGACHAT_QPS", 0))
+    GIGACHAT_BURST = int(os.getenv("GIGACHAT_BURST", 10))
+    # Таймаут подстраивается под p95 задержки: p95 * FACTOR в пределах [MIN_TIMEOUT, GIGACHAT_TIMEOUT]
+    GIGACHAT_MIN_TIMEOUT = float(os.getenv("GIGACHAT_MIN_TIMEOUT", 15))
+    GIGACHAT_TIMEOUT_FACTOR = float(os.getenv("GIGACHAT_TIMEOUT_FACTOR", 2.0))
+    GIGACHAT_BREAKER_WINDOW = int(os.getenv("GIGACHAT_BREAKER_WINDOW", 20))
+    GIGACHAT_BREAKER_MIN_CALLS = int(os.getenv("GIGACHAT_BREAKER_MIN_CALLS", 5))
+    GIGACHAT_BREAKER_ERROR_RATE = float(os.getenv("GIGACHAT_BREAKER_ERROR_RATE", 0.5))
+    GIGACHAT_BREAKER_OPEN_SECONDS = float(os.getenv("GIGACHAT_BREAKER_OPEN_SECONDS", 30))
+    RECIPE_CACHE_SIZE = int(os.getenv("RECIPE_CACHE_SIZE", 1000))
+    RECIPE_CACHE_TTL = int(os.getenv("RECIPE_CACHE_TTL", 24 * 3600))
+    RECIPE_CACHE_VARIANTS = int(os.getenv("RECIPE_CACHE_VARIANTS", 3))
+    RECIPE_CACHE_SHARED = os.getenv("RECIPE_CACHE_SHARED", "false").lower() == "true"
+    RECIPE_CACHE_SHARED_MAX_ROWS = int(os.getenv("RECIPE_CACHE_SHARED_MAX_ROWS", 100000))
+    LOCAL_RECIPES_PATH = os.getenv("LOCAL_RECIPES_PATH", os.path.join(os.path.dirname(__file__), "data", "recipes.json"))
+    TAXONOMY_PATH = os.getenv("TAXONOMY_PATH", os.path.join(os.path.dirname(__file__), "data", "taxonomy.json"))
+    # Если в холодильнике есть все продукты локального рецепта, отвечаем им без обращения к GigaChat
+    LOCAL_RECIPES_FIRST = os.getenv("LOCAL_RECIPES_FIRST", "true").lower() == "true"
+    LOCAL_RECIPE_MIN_COVERAGE = float(os.getenv("LOCAL_RECIPE_MIN_COVERAGE", 1.0))
+    # Доля продуктов рецепта, достаточная для резервного ответа, когда GigaChat недоступен
+    LOCAL_RECIPE_FALLBACK_COVERAGE = float(os.getenv("LOCAL_RECIPE_FALLBACK_COVERAGE", 0.5))
+    STREAM_RECIPES = os.getenv("STREAM_RECIPES", "true").lower() == "true"
+    # Ответ GigaChat в виде JSON по схеме с проверкой; важнее STREAM_RECIPES, потоковая выдача при этом не используется
+    GIGACHAT_JSON_MODE = os.getenv("GIGACHAT_JSON_MODE", "false").lower() == "true"
+    # Сколько разных рецептов просить за один запрос к GigaChat (1 - по одному). Лишние рецепты
+    # откладываются пользователю на следующие нажатия; как и JSON-режим, отключает потоковую выдачу
+    RECIPE_BATCH_SIZE = int(os.getenv("RECIPE_BATCH_SIZE", 1))
+    STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", 1.5))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+    # Рассылать сброс кэша пользователей всем процессам через LISTEN/NOTIFY (по умолчанию в режиме webhook)
+    USER_CACHE_SYNC = os.getenv("USER_CACHE_SYNC", str(BOT_MODE == "webhook")).lower() == "true"
+    SUGGESTION_BUFFER_SIZE = int(os.getenv("SUGGESTION_BUFFER_SIZE", 10000))
+    SUGGESTION_TTL = int(os.getenv("SUGGESTION_TTL", 3600))
+    # Заранее генерировать рецепт после изменения холодильника
+    SPECULATIVE_RECIPES = os.getenv("SPECULATIVE_RECIPES", "false").lower() == "true"
+    SPECULATION_DELAY = float(os.getenv("SPECULATION_DELAY", 5.0))
+    SPECULATION_MAX_CONCURRENT = int(os.getenv("SPECULATION_MAX_CONCURRENT", 2))
+    FRIDGE_IMPORT_MAX_ITEMS = int(os.getenv("FRIDGE_IMPORT_MAX_ITEMS", 200))
+    FRIDGE_IMPORT_MAX_BYTES = int(os.getenv("FRIDGE_IMPORT_MAX_BYTES", 1024 * 1024))
+    # Запросов рецепта на пользователя в минуту (0 - без ограничения)
+    RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", 5))
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 3))
+    # true - при исчерпании бюджета GigaChat отдаем рецепт из локальной базы, а не ждем
+    RATE_LIMIT_DEGRADE = os.getenv("RATE_LIMIT_DEGRADE", "false").lower() == "true"
+    # memory - очередь в процессе; db - таблица recipe_jobs, задачи переживают перезапуск
+    RECIPE_QUEUE_BACKEND = os.getenv("RECIPE_QUEUE_BACKEND", "memory")
+    RECIPE_QUEUE_SIZE = int(os.getenv("RECIPE_QUEUE_SIZE", 500))
+    RECIPE_WORKERS = int(os.getenv("RECIPE_WORKERS", 20))
+    RECIPE_QUEUE_POLL_INTERVAL = float(os.getenv("RECIPE_QUEUE_POLL_INTERVAL", 1.0))
+    # Секунды без продления аренды, после которых задачу упавшего воркера берет другой
+    RECIPE_JOB_LEASE = int(os.getenv("RECIPE_JOB_LEASE", 60))
+    # Рецептов на странице истории в боте и в API
+    RECIPE_PAGE_SIZE = int(os.getenv("RECIPE_PAGE_SIZE", 5))
+    API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 20))
+    API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 100))
 
 config = Config()
\ No newline at end of file
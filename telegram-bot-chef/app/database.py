@@ -1,23 +1,117 @@
+import os
+import time
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import exc, inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import config
 
-Base = declarative_base()
-engine = create_async_engine(config.DATABASE_URL, echo=True)
+class PoolMetrics:
+    """Статистика ожидания соединений из пула"""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record_wait(self, wait: float):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+    
+    def stats(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.timeouts,
+            "avg_checkout_wait_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_checkout_wait_ms": round(self.max_wait * 1000, 2)
+        }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания свободного соединения"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+def _engine_options() -> dict:
+    options = {
+        "echo": config.DB_ECHO,
+        "poolclass": InstrumentedPool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING
+    }
+    if config.DATABASE_URL.startswith("postgresql+asyncpg"):
+        # Кэш подготовленных выражений SQLAlchemy и самого asyncpg (0 - для pgbouncer в режиме transaction)
+        options["connect_args"] = {
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE
+        }
+    return options
+
+engine = create_async_engine(config.DATABASE_URL, **_engine_options())
 AsyncSessionLocal = sessionmaker(
     engine, 
     class_=AsyncSession, 
     expire_on_commit=False
 )
 
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "alembic.ini")
+# Ключ pg_advisory_xact_lock: миграции применяет только один процесс, остальные ждут
+MIGRATIONS_LOCK_ID = 72_015_001
+
+def _run_migrations(connection):
+    alembic_config = Config(ALEMBIC_INI)
+    alembic_config.attributes["connection"] = connection
+    tables = inspect(connection)
+    if not tables.has_table("alembic_version") and tables.has_table("users"):
+        # База создана до появления миграций - ее схема соответствует первой ревизии
+        print("⚠️ База без истории миграций, отмечаем начальную ревизию")
+        command.stamp(alembic_config, "0001")
+    command.upgrade(alembic_config, "head")
+
 async def init_db():
+    """Применяет миграции Alembic до последней ревизии"""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATIONS_LOCK_ID})
+        await conn.run_sync(_run_migrations)
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+async def release_connection(session: AsyncSession):
+    """Завершает текущую транзакцию, чтобы вернуть соединение в пул перед долгим ожиданием.
+    Сессия остается рабочей и при следующем запросе снова возьмет соединение из пула"""
+    if session.in_transaction():
+        await session.commit()
+
+def get_pool_stats() -> dict:
+    """Текущее состояние пула соединений и статистика ожидания"""
+    pool = engine.sync_engine.pool
+    stats = {
+        "pool_size": pool.size(),
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow()
+    }
+    stats.update(pool_metrics.stats())
+    return stats
\ No newline at end of file
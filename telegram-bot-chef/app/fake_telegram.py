@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+sys.path.append(os.path.dirname(__file__))
+
+from config import config
+
+# Локальная проверка режима webhook без Telegram:
+#   1. python fake_telegram.py   (поднимает поддельный Bot API на FAKE_TELEGRAM_PORT)
+#   2. BOT_MODE=webhook TELEGRAM_API_URL=http://localhost:8081
+#      WEBHOOK_BASE_URL=http://localhost:8000 WEBHOOK_SECRET=... python main.py
+#   3. вводите сообщения в консоли fake_telegram.py - они уходят боту как обновления,
+#      а ответы бота печатаются здесь же
+
+FAKE_PORT = int(os.getenv("FAKE_TELEGRAM_PORT", 8081))
+FAKE_USER_ID = int(os.getenv("FAKE_TELEGRAM_USER_ID", 100001))
+
+message_ids = itertools.count(1)
+update_ids = itertools.count(1)
+webhook = {"url": "", "secret": ""}
+
+def _message(chat_id, text, message_id=None):
+    return {
+        "message_id": message_id or next(message_ids),
+        "date": int(time.time()),
+        "chat": {"id": int(chat_id), "type": "private"},
+        "text": text or ""
+    }
+
+async def handle_method(request: web.Request) -> web.Response:
+    method = request.match_info["method"]
+    params = dict(await request.post())
+    if not params and request.can_read_body:
+        params = await request.json()
+
+    if method == "getMe":
+        result = {"id": 1, "is_bot": True, "first_name": "FakeChef", "username": "fake_chef_bot"}
+    elif method == "getWebhookInfo":
+        result = {"url": webhook["url"], "has_custom_certificate": False, "pending_update_count": 0}
+    elif method == "setWebhook":
+        webhook["url"] = params.get("url", "")
+        webhook["secret"] = params.get("secret_token", "")
+        print(f"🔗 Вебхук установлен: {webhook['url']}")
+        result = True
+    elif method == "deleteWebhook":
+        webhook["url"] = ""
+        result = True
+    elif method == "sendMessage":
+        print(f"\n🤖 {params.get('text')}\n")
+        result = _message(params["chat_id"], params.get("text"))
+    elif method == "editMessageText":
+        print(f"\n✏️ [#{params.get('message_id')}] {params.get('text')}\n")
+        result = _message(params["chat_id"], params.get("text"), int(params["message_id"]))
+    else:
+        print(f"ℹ️ {method}: {params}")
+        result = True
+
+    return web.json_response({"ok": True, "result": result})
+
+async def send_update(session: ClientSession, text: str):
+    update = {
+        "update_id": next(update_ids),
+        "message": {
+            **_message(FAKE_USER_ID, text),
+            "from": {"id": FAKE_USER_ID, "is_bot": False, "first_name": "Тестер"}
+        }
+    }
+    url = webhook["url"] or (config.WEBHOOK_BASE_URL or "http://localhost:8000").rstrip("/") + config.WEBHOOK_PATH
+    headers = {"X-Telegram-Bot-Api-Secret-Token": webhook["secret"] or config.WEBHOOK_SECRET or ""}
+    async with session.post(url, data=json.dumps(update), headers={**headers, "Content-Type": "application/json"}) as response:
+        if response.status != 200:
+            print(f"❌ Вебхук ответил {response.status}: {await response.text()}")
+
+async def main():
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", handle_method)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", FAKE_PORT).start()
+    print(f"✅ Поддельный Bot API запущен на http://localhost:{FAKE_PORT}")
+    print(" Вводите сообщения (например /start или 🍴 Создать рецепт), пустая строка - выход")
+
+    async with ClientSession() as session:
+        while True:
+            text = await asyncio.to_thread(input, "> ")
+            if not text:
+                break
+            await send_update(session, text)
+
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
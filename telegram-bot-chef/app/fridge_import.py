@@ -0,0 +1,118 @@
+import csv
+import io
+import re
+from dataclasses import replace
+from typing import List, Tuple
+
+from sqlalchemy import BigInteger, Float, String, cast, column, exists, insert, literal, select, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ingredient_parser import ParsedIngredient, parse_ingredient
+from models import FridgeItem
+
+# Маркеры списков, которые остаются при копировании из заметок: "•", "-", "1.", "[ ]", "☐".
+# Номер считается маркером, только если за ним не идет цифра: "1.5 л молока" - это количество
+_BULLET_RE = re.compile(r"^\s*(?:[-•*·–—☐☑✓✔]|\[[ xх]?\]|\d+[.)](?!\d))\s*", re.IGNORECASE)
+_HEADER_NAMES = {"название", "продукт", "продукты", "ингредиент", "наименование", "name", "product", "ingredient"}
+
+def _fit_columns(item: ParsedIngredient) -> ParsedIngredient:
+    """Обрезает текстовые поля до размеров колонок fridge_items, чтобы одна слишком
+    длинная строка не ломала вставку всего списка"""
+    columns = FridgeItem.__table__.c
+    return replace(
+        item,
+        name=item.name[:columns.ingredient_name.type.length],
+        canonical_name=item.canonical_name[:columns.canonical_name.type.length],
+        quantity=item.quantity[:columns.quantity.type.length],
+        category=item.category[:columns.category.type.length] if item.category else item.category
+    )
+
+def parse_shopping_list(text: str, limit: int) -> Tuple[List[ParsedIngredient], bool]:
+    """Разбирает многострочный список покупок: один продукт на строку или через ";".
+    Повторы одного продукта схлопываются, остается последний. Возвращает продукты
+    и признак того, что список обрезан по limit"""
+    items = {}
+    for line in re.split(r"[\n;]", text):
+        line = _BULLET_RE.sub("", line).strip()
+        # Пропускаем пустые строки и заголовки вроде "Купить:"
+        if not line or line.endswith(":"):
+            continue
+        item = _fit_columns(parse_ingredient(line))
+        if not item.canonical_name:
+            continue
+        if item.canonical_name not in items and len(items) >= limit:
+            return list(items.values()), True
+        items.pop(item.canonical_name, None)
+        items[item.canonical_name] = item
+    return list(items.values()), False
+
+def _decode(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="ignore")
+
+def parse_document(filename: str, data: bytes, limit: int) -> Tuple[List[ParsedIngredient], bool]:
+    """Разбирает загруженный файл: CSV (название[, количество]) или обычный текст"""
+    text = _decode(data)
+    if not (filename or "").lower().endswith(".csv"):
+        return parse_shopping_list(text, limit)
+
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    lines = []
+    for row in csv.reader(io.StringIO(text), dialect):
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if not cells or (not lines and cells[0].lower() in _HEADER_NAMES):
+            continue
+        lines.append(" ".join(cells[:2]))
+    return parse_shopping_list("\n".join(lines), limit)
+
+async def add_fridge_items(session: AsyncSession, user_id: int, items: List[ParsedIngredient]) -> List[str]:
+    """Добавляет продукты одним запросом INSERT ... SELECT FROM VALUES, пропуская те,
+    что уже есть в холодильнике пользователя. Дубли ищутся по canonical_name: записи,
+    сохраненные до его появления, разобрала миграция 0008. Возвращает канонические
+    названия добавленных. Коммит остается за вызывающим"""
+    if not items:
+        return []
+    items = [_fit_columns(item) for item in items]
+
+    incoming = values(
+        column("ingredient_name", String),
+        column("canonical_name", String),
+        column("quantity", String),
+        column("amount", Float),
+        column("unit", String),
+        column("category", String),
+        name="incoming"
+    ).data([
+        (item.name, item.canonical_name, item.quantity, item.amount, item.unit, item.category)
+        for item in items
+    ])
+    already_stored = exists().where(
+        FridgeItem.user_id == user_id,
+        FridgeItem.canonical_name == incoming.c.canonical_name
+    )
+    stmt = (
+        insert(FridgeItem)
+        .from_select(
+            ["user_id", "ingredient_name", "canonical_name", "quantity", "amount", "unit", "category"],
+            select(
+                literal(user_id, BigInteger),
+                incoming.c.ingredient_name,
+                incoming.c.canonical_name,
+                incoming.c.quantity,
+                # Если у всех строк количество не указано, Postgres выведет для колонки тип text
+                cast(incoming.c.amount, Float),
+                incoming.c.unit,
+                incoming.c.category
+            ).where(~already_stored)
+        )
+        .returning(FridgeItem.canonical_name)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars())
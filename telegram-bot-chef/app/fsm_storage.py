@@ -0,0 +1,51 @@
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import FsmState
+
+class DbStorage(BaseStorage):
+    """FSM-хранилище в PostgreSQL: состояние диалога видно всем процессам бота"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], key_builder: Optional[KeyBuilder] = None):
+        self.session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._upsert(key, state=value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = await self._get(key)
+        return row.state if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._upsert(key, data=data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = await self._get(key)
+        return dict(row.data or {}) if row else {}
+
+    async def close(self) -> None:
+        pass
+
+    async def _get(self, key: StorageKey):
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(FsmState.state, FsmState.data).where(FsmState.key == self.key_builder.build(key))
+            )
+            return result.first()
+
+    async def _upsert(self, key: StorageKey, **values: Any):
+        stmt = insert(FsmState).values(key=self.key_builder.build(key), **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FsmState.key],
+            set_={**values, "updated_at": func.now()}
+        )
+        async with self.session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
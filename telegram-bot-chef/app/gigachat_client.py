@@ -1,11 +1,62 @@
 import asyncio
+from functools import cached_property
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
 from gigachat import GigaChat
+from gigachat.client import _get_kwargs
 from gigachat.models import Chat, Messages, MessagesRole
 from config import config
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from prompts import build_recipe_chat, build_repair_chat, token_usage
+from schemas import parse_recipe_batch, parse_recipe_json
+from pydantic import ValidationError
+from rate_limit import AdmissionController
+
+class PooledGigaChat(GigaChat):
+    """GigaChat с общим keep-alive пулом соединений и единым обновлением токена"""
+
+    def __init__(self, *, max_connections: int, max_keepalive_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._token_lock = asyncio.Lock()
+
+    @cached_property
+    def _aclient(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(**_get_kwargs(self._settings), limits=self._limits)
+
+    async def _aupdate_token(self) -> None:
+        # Одновременные запросы не должны получать токен каждый по отдельности
+        stale_token = self.token
+        async with self._token_lock:
+            if self.token is not None and self.token != stale_token:
+                return
+            await super()._aupdate_token()
 
 class GigaChatClient:
     def __init__(self):
         self.client = None
+        self.admission = AdmissionController(
+            qps=config.GIGACHAT_QPS,
+            burst=config.GIGACHAT_BURST,
+            max_concurrency=config.GIGACHAT_MAX_CONCURRENCY
+        )
+        self.breaker = CircuitBreaker(
+            "GigaChat",
+            window=config.GIGACHAT_BREAKER_WINDOW,
+            min_calls=config.GIGACHAT_BREAKER_MIN_CALLS,
+            error_rate=config.GIGACHAT_BREAKER_ERROR_RATE,
+            open_seconds=config.GIGACHAT_BREAKER_OPEN_SECONDS,
+            min_timeout=config.GIGACHAT_MIN_TIMEOUT,
+            max_timeout=config.GIGACHAT_TIMEOUT,
+            timeout_factor=config.GIGACHAT_TIMEOUT_FACTOR
+        )
+        self.json_requests = 0
+        self.json_repaired = 0
+        self.json_failed = 0
         self._initialize_client()
     
     def _initialize_client(self):
@@ -16,11 +67,13 @@ class GigaChatClient:
             
             print("🔄 Инициализация GigaChat клиента...")
             
-            self.client = GigaChat(
+            self.client = PooledGigaChat(
                 credentials=config.GIGACHAT_CLIENT_SECRET,
                 scope=config.GIGACHAT_SCOPE,
                 verify_ssl_certs=False,
-                timeout=60
+                timeout=config.GIGACHAT_TIMEOUT,
+                max_connections=config.GIGACHAT_MAX_CONNECTIONS,
+                max_keepalive_connections=config.GIGACHAT_MAX_KEEPALIVE
             )
             
             # Проверяем подключение
@@ -34,52 +87,51 @@ class GigaChatClient:
         #Проверяет, доступен ли GigaChat
         return self.client is not None and config.GIGACHAT_CLIENT_SECRET is not None
     
+    async def _achat(self, chat: Chat):
+        """Асинхронный запрос к GigaChat в рамках общего бюджета, с адаптивным таймаутом
+        и учетом результата в circuit breaker"""
+        async with self.admission:
+            async with self.breaker.guard():
+                return await asyncio.wait_for(self.client.achat(chat), timeout=self.breaker.timeout())
+    
+    async def close(self):
+        """Закрывает пул соединений GigaChat"""
+        if self.client is not None:
+            await self.client.aclose()
+    
+    def _build_recipe_chat(self, ingredients: list, user_preferences: dict, json_mode: bool = False,
+                           variants: int = 1) -> Chat:
+        """Собирает запрос к GigaChat для генерации рецепта"""
+        return build_recipe_chat(ingredients, user_preferences, config.PROMPT_MAX_INPUT_TOKENS, json_mode, variants)
+    
     async def generate_recipe(self, ingredients: list, user_preferences: dict) -> str:
         
         if not self.is_available():
             print("❌ GigaChat клиент не доступен")
             return None
         
-        prompt = self._create_strict_recipe_prompt(ingredients, user_preferences)
-        
         try:
             print(f"🔄 Генерируем рецепт для ингредиентов: {ingredients}")
-            
-            system_message = """Ты - профессиональный шеф-повар. Твоя задача - создавать рецепты ИСКЛЮЧИТЕЛЬНО из указанных пользователем ингредиентов.
-
-СТРОГИЕ ПРАВИЛА:
-1. Используй ТОЛЬКО те ингредиенты, которые указал пользователь
-2. Можешь добавить только базовые специи: соль, перец, растительное масло, сахар, вода
-3. НИКОГДА не добавляй дополнительные ингредиенты, которых нет у пользователя
-4. Если ингредиентов недостаточно - предложи максимально простой вариант
-5. Всегда отвечай на русском языке
-6. Строго соблюдай указанный формат ответа"""
-
-            messages = [
-                Messages(role=MessagesRole.SYSTEM, content=system_message),
-                Messages(role=MessagesRole.USER, content=prompt)
-            ]
-            
-            chat = Chat(
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000
-            )
+            chat = self._build_recipe_chat(ingredients, user_preferences)
             
             # Асинхронный вызов с таймаутом
             print(" Отправляем запрос к GigaChat...")
-            response = await asyncio.to_thread(self.client.chat, chat)
+            response = await self._achat(chat)
             
             if not response or not response.choices:
                 print("❌ Пустой ответ от GigaChat")
                 return None
             
             recipe_text = response.choices[0].message.content
+            token_usage.record(chat, recipe_text, response.usage)
             print("✅ Рецепт успешно сгенерирован GigaChat")
             print(f" Длина ответа: {len(recipe_text)} символов")
             
             return recipe_text
             
+        except CircuitOpenError:
+            print("⚡ GigaChat временно отключен после серии ошибок")
+            return None
         except asyncio.TimeoutError:
             print("❌ Таймаут при запросе к GigaChat")
             return None
@@ -87,63 +139,117 @@ class GigaChatClient:
             print(f"❌ Ошибка GigaChat: {str(e)}")
             return None
     
-    def _create_strict_recipe_prompt(self, ingredients: list, user_preferences: dict) -> str:
+    async def _complete(self, chat: Chat) -> Optional[str]:
+        response = await self._achat(chat)
+        if not response or not response.choices:
+            return None
+        text = response.choices[0].message.content
+        token_usage.record(chat, text, response.usage)
+        return text
+    
+    async def _generate_structured(self, chat: Chat, parse: Callable[[str], Any], variants: int = 1) -> Any:
+        """Запрашивает JSON-ответ и проверяет его одним декодированием через parse.
+        Если ответ не проходит проверку, один раз просит модель исправить его"""
+        if not self.is_available():
+            print("❌ GigaChat клиент не доступен")
+            return None
         
-        # Форматируем ингредиенты для лучшего восприятия
-        formatted_ingredients = "\n".join([f"- {ing}" for ing in ingredients])
+        self.json_requests += 1
+        try:
+            answer = await self._complete(chat)
+            if not answer:
+                print("❌ Пустой ответ от GigaChat")
+                self.json_failed += 1
+                return None
+            
+            try:
+                return parse(answer)
+            except ValidationError as e:
+                errors = "; ".join(
+                    f"{'.'.join(map(str, error['loc'])) or 'ответ'}: {error['msg']}" for error in e.errors()[:5]
+                )
+                print(f"⚠️ Ответ GigaChat не прошел проверку схемы, просим исправить: {errors}")
+            
+            self.json_repaired += 1
+            answer = await self._complete(build_repair_chat(chat, answer, errors, variants))
+            result = parse(answer) if answer else None
+            if result is None:
+                self.json_failed += 1
+            return result
+            
+        except CircuitOpenError:
+            print("⚡ GigaChat временно отключен после серии ошибок")
+        except asyncio.TimeoutError:
+            print("❌ Таймаут при запросе к GigaChat")
+        except ValidationError as e:
+            print(f"❌ Исправленный ответ GigaChat тоже не прошел проверку: {e.error_count()} ошибок")
+        except Exception as e:
+            print(f"❌ Ошибка GigaChat: {str(e)}")
+        self.json_failed += 1
+        return None
+    
+    async def generate_recipe_json(self, ingredients: list, user_preferences: dict) -> Optional[Dict[str, Any]]:
+        """Генерирует рецепт в виде JSON по схеме schemas.RecipeSchema"""
+        print(f"🔄 Генерируем рецепт (JSON) для ингредиентов: {ingredients}")
+        chat = self._build_recipe_chat(ingredients, user_preferences, json_mode=True)
+        recipe = await self._generate_structured(chat, parse_recipe_json)
+        return recipe.to_recipe() if recipe else None
+    
+    async def generate_recipe_batch(self, ingredients: list, user_preferences: dict, count: int) -> List[Dict[str, Any]]:
+        """Генерирует до count разных рецептов одним запросом к GigaChat"""
+        print(f"🔄 Генерируем {count} рецептов для ингредиентов: {ingredients}")
+        chat = self._build_recipe_chat(ingredients, user_preferences, variants=count)
+        recipes = await self._generate_structured(chat, parse_recipe_batch, count)
+        if not recipes:
+            return []
+        print(f"✅ GigaChat вернул рецептов: {len(recipes)} из {count}")
+        return [recipe.to_recipe() for recipe in recipes[:count]]
+    
+    def json_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.json_requests,
+            "repaired": self.json_repaired,
+            "failed": self.json_failed
+        }
+    
+    async def stream_recipe(self, ingredients: list, user_preferences: dict) -> AsyncIterator[str]:
+        """Генерирует рецепт потоково, отдавая фрагменты текста по мере получения.
+        Ошибки и таймаут пробрасываются вызывающему, чтобы не принять обрывок за рецепт"""
+        if not self.is_available():
+            print("❌ GigaChat клиент не доступен")
+            return
         
-        prompt = f"""
-ЗАДАЧА: СОЗДАТЬ КУЛИНАРНЫЙ РЕЦЕПТ ИСКЛЮЧИТЕЛЬНО ИЗ УКАЗАННЫХ ИНГРЕДИЕНТОВ
-
-ДОСТУПНЫЕ ИНГРЕДИЕНТЫ (ЭТО ВСЕ, ЧТО ЕСТЬ):
-{formatted_ingredients}
-
-РАЗРЕШЕННЫЕ ДОПОЛНЕНИЯ (только если нужны):
-- соль
-- перец  
-- растительное масло
-- сахар
-- вода
-
-ЗАПРЕЩЕНО:
-- Добавлять любые другие ингредиенты, кроме указанных выше
-- Предлагать продукты, которых нет в списке
-- Использовать ингредиенты, которых у пользователя нет
-
-ДОПОЛНИТЕЛЬНАЯ ИНФОРМАЦИЯ О ПОЛЬЗОВАТЕЛЕ:
-- Уровень кулинарных навыков: {user_preferences.get('cooking_skill', 'новичок')}
-- Диетические предпочтения: {', '.join(user_preferences.get('dietary_preferences', [])) or 'нет'}
-- Аллергии: {', '.join(user_preferences.get('allergies', [])) or 'нет'}
-
-ТРЕБОВАНИЯ К РЕЦЕПТУ:
-1. Используй ТОЛЬКО доступные ингредиенты из списка выше
-2. Учитывай уровень навыков пользователя
-3. Сделай рецепт практичным и выполнимым
-4. Укажи точное время приготовления
-5. Оцени сложность приготовления
-
-ФОРМАТ ОТВЕТА (ОБЯЗАТЕЛЬНО СОБЛЮДАЙ!):
-
-НАЗВАНИЕ РЕЦЕПТА (с эмодзи)
-
-ИНГРЕДИЕНТЫ:
-- ингредиент 1 - количество (только из списка выше)
-- ингредиент 2 - количество (только из списка выше)
-...
-
-ПРИГОТОВЛЕНИЕ:
-1. Шаг 1 приготовления
-2. Шаг 2 приготовления
-...
-
-ВРЕМЯ ПРИГОТОВЛЕНИЯ: X минут
-СЛОЖНОСТЬ: легко/средне/сложно
-
-ПОВТОРЯЮ: НЕ ДОБАВЛЯЙ НИКАКИХ ДРУГИХ ИНГРЕДИЕНТОВ, КРОМЕ ТЕХ, ЧТО В СПИСКЕ!
-"""
-
-        return prompt
-
+        print(f"🔄 Потоковая генерация рецепта для ингредиентов: {ingredients}")
+        chat = self._build_recipe_chat(ingredients, user_preferences)
+        loop = asyncio.get_running_loop()
+        
+        async with self.admission, self.breaker.guard():
+            deadline = loop.time() + self.breaker.timeout()
+            chunks = self.client.astream(chat)
+            # В потоковых фрагментах нет usage, поэтому токены ответа оцениваем по тексту
+            recipe_text = ""
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        recipe_text += chunk.choices[0].delta.content
+                        yield chunk.choices[0].delta.content
+                token_usage.record(chat, recipe_text)
+            except asyncio.TimeoutError:
+                print("❌ Таймаут при потоковом запросе к GigaChat")
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка потоковой генерации GigaChat: {str(e)}")
+                raise
+            finally:
+                await chunks.aclose()
+    
     async def test_connection(self) -> bool:
         """Тестирует подключение к GigaChat"""
         if not self.is_available():
@@ -156,7 +262,7 @@ class GigaChatClient:
             ]
             
             chat = Chat(messages=test_messages)
-            response = await asyncio.to_thread(self.client.chat, chat)
+            response = await self._achat(chat)
             
             if response and response.choices:
                 print("✅ Тест подключения к GigaChat пройден")
@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+def make_etag(*parts: Any) -> str:
+    """Слабый ETag по значениям, от которых зависит ответ"""
+    raw = "|".join(str(part) for part in parts)
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Проверяет условные заголовки запроса. If-None-Match важнее If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Last-Modified передается с точностью до секунды
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def _cache_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+def not_modified(etag: str, last_modified: Optional[datetime], cache_control: str) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag, last_modified, cache_control))
+
+def cached_json(model: BaseModel, etag: str, last_modified: Optional[datetime], cache_control: str) -> ORJSONResponse:
+    """Ответ модели через orjson вместе с заголовками для условных запросов"""
+    return ORJSONResponse(
+        content=model.model_dump(),
+        headers=_cache_headers(etag, last_modified, cache_control)
+    )
\ No newline at end of file
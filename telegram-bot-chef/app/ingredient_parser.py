@@ -0,0 +1,100 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from categorizer import categorizer
+from recipe_cache import normalize_ingredient
+
+# Написание единицы -> (как показывать, базовая единица, множитель к базовой)
+_UNITS: Dict[str, Tuple[str, str, float]] = {}
+
+def _register(display: str, base: str, factor: float, *spellings: str):
+    for spelling in (display,) + spellings:
+        _UNITS[spelling] = (display, base, factor)
+
+_register("г", "г", 1, "г.", "гр", "гр.", "грамм", "грамма", "граммов")
+_register("кг", "г", 1000, "кг.", "килограмм", "килограмма", "килограммов", "кило")
+_register("мг", "г", 0.001, "мг.")
+_register("мл", "мл", 1, "мл.", "миллилитр", "миллилитров")
+_register("л", "мл", 1000, "л.", "литр", "литра", "литров")
+_register("шт", "шт", 1, "шт.", "штук", "штуки", "штука")
+_register("десяток", "шт", 10, "десятка", "десятков")
+_register("ст.л.", "ст.л.", 1, "ст.л", "ст. л.", "ст л", "столовая ложка", "столовые ложки", "столовых ложек")
+_register("ч.л.", "ч.л.", 1, "ч.л", "ч. л.", "ч л", "чайная ложка", "чайные ложки", "чайных ложек")
+_register("уп", "уп", 1, "уп.", "упаковка", "упаковки", "упаковок", "пачка", "пачки", "пачек")
+_register("банка", "банка", 1, "банки", "банок")
+_register("зубчик", "зубчик", 1, "зубчика", "зубчиков")
+_register("пучок", "пучок", 1, "пучка", "пучков")
+_register("стакан", "стакан", 1, "стакана", "стаканов")
+
+_UNIT_PATTERN = "|".join(re.escape(unit) for unit in sorted(_UNITS, key=len, reverse=True))
+# Число или дробь "1/2" и необязательная единица сразу после него. Число берется целиком:
+# "3.2%" - процент жирности, а не "3" с остатком ".2%" в названии
+_AMOUNT_RE = re.compile(
+    rf"(?<![\w.,/])(\d+(?:[.,]\d+|/[1-9]\d*)?)(?![.,/]?\d)(?!\s*%)\s*({_UNIT_PATTERN})?(?![\w])",
+    re.IGNORECASE
+)
+
+@dataclass(frozen=True)
+class ParsedIngredient:
+    """Продукт из холодильника: название, количество в базовых единицах и категория"""
+    name: str
+    canonical_name: str
+    quantity: str = ""
+    amount: Optional[float] = None
+    unit: Optional[str] = None
+    category: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """Название вместе с количеством, как его показывать пользователю и GigaChat"""
+        return f"{self.name} {self.quantity}" if self.quantity else self.name
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "ParsedIngredient":
+        """Собирает продукт из строки fridge_items. Записи, сохраненные до появления
+        структурированных полей, разбираются парсером"""
+        if not row.get("canonical_name"):
+            return parse_ingredient(row.get("name") or "")
+        return cls(
+            name=row["name"],
+            canonical_name=row["canonical_name"],
+            quantity=row.get("quantity") or "",
+            amount=row.get("amount"),
+            unit=row.get("unit"),
+            category=row.get("category")
+        )
+
+def _format_number(value: float) -> str:
+    return f"{value:g}"
+
+def _parse_number(text: str) -> float:
+    numerator, _, denominator = text.replace(",", ".").partition("/")
+    return float(numerator) / float(denominator) if denominator else float(numerator)
+
+def parse_ingredient(text: str) -> ParsedIngredient:
+    """Разбирает ввод пользователя вида "куриное филе 400г" или "2 яйца" """
+    text = " ".join(text.split())
+    matches = list(_AMOUNT_RE.finditer(text))
+    # Предпочитаем число с единицей измерения: "творог 5% 2 уп" -> 2 уп
+    match = next((m for m in reversed(matches) if m.group(2)), matches[-1] if matches else None)
+
+    quantity, amount, unit = "", None, None
+    name = text
+    if match:
+        number = _parse_number(match.group(1))
+        display, unit, factor = _UNITS.get((match.group(2) or "шт").lower(), _UNITS["шт"])
+        quantity = f"{_format_number(number)} {display}"
+        amount = round(number * factor, 3)
+        name = text[:match.start()] + " " + text[match.end():]
+
+    name = " ".join(name.split()).strip(" ,;:-–—")
+    canonical_name = normalize_ingredient(name)
+    return ParsedIngredient(
+        name=name,
+        canonical_name=canonical_name,
+        quantity=quantity,
+        amount=amount,
+        unit=unit,
+        category=categorizer.categorize(canonical_name) if canonical_name else None
+    )
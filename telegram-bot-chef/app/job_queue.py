@@ -0,0 +1,279 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from config import config
+from database import AsyncSessionLocal
+from models import RecipeJob
+
+# Результаты постановки в очередь
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+FULL = "full"
+
+# Условие частичного уникального индекса: у пользователя не больше одной активной задачи
+ACTIVE_JOB_CONDITION = "status IN ('pending', 'running')"
+
+@dataclass
+class QueuedJob:
+    """Задача на генерацию рецепта и сообщение-заглушка, в которое нужно доставить результат"""
+    user_id: int
+    chat_id: int
+    message_id: int
+    enqueued_at: float
+    id: Optional[int] = None
+
+class MemoryJobBackend:
+    """Очередь в памяти процесса: быстрая, но теряет задачи при перезапуске"""
+
+    def __init__(self, max_size: int):
+        self._queue: "asyncio.Queue[QueuedJob]" = asyncio.Queue(max_size)
+        self._active_users = set()
+
+    async def put(self, job: QueuedJob) -> str:
+        if job.user_id in self._active_users:
+            return DUPLICATE
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return FULL
+        self._active_users.add(job.user_id)
+        return QUEUED
+
+    async def get(self) -> QueuedJob:
+        return await self._queue.get()
+
+    async def touch(self, job: QueuedJob):
+        pass
+
+    async def release(self, job: QueuedJob):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._active_users.discard(job.user_id)
+
+    async def done(self, job: QueuedJob):
+        self._active_users.discard(job.user_id)
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+class PostgresJobBackend:
+    """Очередь в таблице recipe_jobs: задачи переживают перезапуск и делятся между процессами.
+    Пока задача выполняется, воркер продлевает аренду (started_at); задачи упавшего воркера
+    перезахватываются, как только аренда истечет"""
+
+    def __init__(self, session_factory, max_size: int, poll_interval: float, lease: int):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._wakeup = asyncio.Event()
+
+    async def put(self, job: QueuedJob) -> str:
+        async with self.session_factory() as session:
+            pending = await session.scalar(
+                select(func.count()).select_from(RecipeJob).where(RecipeJob.status == "pending")
+            )
+            if pending >= self.max_size:
+                return FULL
+
+            result = await session.execute(
+                insert(RecipeJob)
+                .values(user_id=job.user_id, chat_id=job.chat_id, message_id=job.message_id, status="pending")
+                .on_conflict_do_nothing(index_elements=[RecipeJob.user_id], index_where=text(ACTIVE_JOB_CONDITION))
+                .returning(RecipeJob.id)
+            )
+            job.id = result.scalar()
+            await session.commit()
+
+        if job.id is None:
+            return DUPLICATE
+        self._wakeup.set()
+        return QUEUED
+
+    async def get(self) -> QueuedJob:
+        while True:
+            job = await self._claim()
+            if job:
+                return job
+            # Ждем новую задачу от этого процесса или следующий опрос таблицы
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Optional[QueuedJob]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                text("""
+                    UPDATE recipe_jobs SET status = 'running', started_at = now()
+                    WHERE id = (
+                        SELECT id FROM recipe_jobs
+                        WHERE status = 'pending'
+                           OR (status = 'running' AND started_at < now() - make_interval(secs => :lease))
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1
+                    )
+                    RETURNING id, user_id, chat_id, message_id, created_at
+                """),
+                {"lease": self.lease}
+            )
+            row = result.first()
+            await session.commit()
+
+        if not row:
+            return None
+        return QueuedJob(
+            user_id=row.user_id,
+            chat_id=row.chat_id,
+            message_id=row.message_id,
+            enqueued_at=row.created_at.timestamp(),
+            id=row.id
+        )
+
+    async def touch(self, job: QueuedJob):
+        async with self.session_factory() as session:
+            await session.execute(
+                update(RecipeJob)
+                .where(RecipeJob.id == job.id, RecipeJob.status == "running")
+                .values(started_at=func.now())
+            )
+            await session.commit()
+
+    async def release(self, job: QueuedJob):
+        async with self.session_factory() as session:
+            await session.execute(
+                update(RecipeJob)
+                .where(RecipeJob.id == job.id, RecipeJob.status == "running")
+                .values(status="pending", started_at=None)
+            )
+            await session.commit()
+
+    async def done(self, job: QueuedJob):
+        async with self.session_factory() as session:
+            await session.execute(delete(RecipeJob).where(RecipeJob.id == job.id))
+            await session.commit()
+
+    async def depth(self) -> int:
+        async with self.session_factory() as session:
+            return await session.scalar(
+                select(func.count()).select_from(RecipeJob).where(RecipeJob.status == "pending")
+            )
+
+class RecipeJobQueue:
+    """Ограниченная очередь генерации рецептов с пулом воркеров"""
+
+    def __init__(self, backend, workers: int, heartbeat_interval: float):
+        self.backend = backend
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[QueuedJob], Awaitable[None]]] = None
+        self._wait_times = deque(maxlen=1000)
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+
+    async def enqueue(self, user_id: int, chat_id: int, message_id: int) -> str:
+        job = QueuedJob(user_id=user_id, chat_id=chat_id, message_id=message_id, enqueued_at=time.time())
+        status = await self.backend.put(job)
+        if status == QUEUED:
+            self.enqueued += 1
+        elif status == DUPLICATE:
+            self.deduplicated += 1
+        else:
+            self.rejected += 1
+        return status
+
+    async def start(self, handler: Callable[[QueuedJob], Awaitable[None]]):
+        self._handler = handler
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✅ Запущено воркеров генерации рецептов: {self.workers}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.backend.get()
+            except Exception as e:
+                print(f"❌ Ошибка получения задачи из очереди: {e}")
+                await asyncio.sleep(config.RECIPE_QUEUE_POLL_INTERVAL)
+                continue
+            
+            self._wait_times.append(time.time() - job.enqueued_at)
+            self.running += 1
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+            try:
+                await self._handler(job)
+                self.completed += 1
+            except asyncio.CancelledError:
+                heartbeat.cancel()
+                # Процесс останавливается: возвращаем задачу в очередь, ее доделает следующий запуск
+                await self._finish(job, self.backend.release)
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Ошибка обработки задачи пользователя {job.user_id}: {e}")
+            finally:
+                heartbeat.cancel()
+                self.running -= 1
+            await self._finish(job, self.backend.done)
+
+    async def _heartbeat(self, job: QueuedJob):
+        """Продлевает аренду задачи, пока она выполняется"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.backend.touch(job)
+            except Exception as e:
+                print(f"❌ Не удалось продлить задачу пользователя {job.user_id}: {e}")
+
+    async def _finish(self, job: QueuedJob, action: Callable[[QueuedJob], Awaitable[None]]):
+        try:
+            await action(job)
+        except Exception as e:
+            print(f"❌ Не удалось завершить задачу пользователя {job.user_id}: {e}")
+
+    async def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "depth": await self.backend.depth(),
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0
+        }
+
+def _create_backend():
+    if config.RECIPE_QUEUE_BACKEND == "db":
+        return PostgresJobBackend(
+            AsyncSessionLocal,
+            max_size=config.RECIPE_QUEUE_SIZE,
+            poll_interval=config.RECIPE_QUEUE_POLL_INTERVAL,
+            lease=config.RECIPE_JOB_LEASE
+        )
+    return MemoryJobBackend(config.RECIPE_QUEUE_SIZE)
+
+# Аренду продлеваем несколько раз за ее срок, чтобы пропуск одного продления ее не терял
+recipe_queue = RecipeJobQueue(_create_backend(), config.RECIPE_WORKERS, config.RECIPE_JOB_LEASE / 3)
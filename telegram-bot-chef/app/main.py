@@ -1,12 +1,35 @@
+import hmac
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
+from typing import Optional
+from aiogram import types
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from bot import bot, dp
-from database import get_db, init_db
+from bot import bot, dp, start_bot, setup_webhook, deliver_recipe
+from database import get_db, init_db, get_pool_stats
 from models import User, Recipe
 from config import config
+from gigachat_client import gigachat_client
+from recipe_cache import recipe_cache
+from agent import chef_agent
+from user_cache import user_cache
+from job_queue import recipe_queue
+from rate_limit import user_limiter
+from recipe_engine import recipe_engine
+from categorizer import categorizer
+from prompts import token_usage
+from suggestions import suggestion_buffer
+from speculation import speculator
+from recipe_history import get_recipe, latest_recipe, list_recipes, recipe_created_at, search_recipes
+from schemas import RecipeOut, RecipePageOut, RecipeSearchOut, UserOut
+from http_cache import cached_json, is_not_modified, make_etag, not_modified
 import asyncio
 
+# Обновления из вебхука обрабатываются в фоне, чтобы сразу ответить Telegram
+webhook_tasks = set()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     
@@ -14,14 +37,28 @@ async def lifespan(app: FastAPI):
     await init_db()
     print("✅ База данных готова!")
     
-    print(" Запуск Telegram бота...")
-    asyncio.create_task(start_bot())
-    print("✅ Бот запущен!")
+    await user_cache.start()
+    await recipe_queue.start(deliver_recipe)
+    
+    if config.BOT_MODE == "webhook":
+        print(" Настройка вебхука Telegram...")
+        await setup_webhook()
+        print("✅ Бот принимает обновления через вебхук!")
+    else:
+        print(" Запуск Telegram бота...")
+        asyncio.create_task(start_bot())
+        print("✅ Бот запущен!")
     
     yield  # Здесь приложение работает
     
     
     print("🛑 Остановка приложения...")
+    if webhook_tasks:
+        await asyncio.wait(webhook_tasks, timeout=30)
+    await speculator.stop()
+    await recipe_queue.stop()
+    await user_cache.stop()
+    await gigachat_client.close()
 
 app = FastAPI(title="Chef Bot API", lifespan=lifespan)
 
@@ -29,41 +66,117 @@ app = FastAPI(title="Chef Bot API", lifespan=lifespan)
 async def root():
     return {"message": "Chef Bot API is running"}
 
-@app.get("/users/{user_id}")
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        "SELECT * FROM users WHERE telegram_id = :user_id", 
-        {"user_id": user_id}
-    )
-    user = result.first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return dict(user)
+@app.post(config.WEBHOOK_PATH)
+async def telegram_webhook(
+    request: Request,
+    secret_token: Optional[str] = Header(None, alias="X-Telegram-Bot-Api-Secret-Token")
+):
+    if config.BOT_MODE != "webhook":
+        raise HTTPException(status_code=404, detail="Webhook mode is disabled")
+    if not config.WEBHOOK_SECRET or not hmac.compare_digest(secret_token or "", config.WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    
+    try:
+        update = types.Update.model_validate(await request.json(), context={"bot": bot})
+    except (ValueError, ValidationError):
+        raise HTTPException(status_code=400, detail="Invalid update")
+    
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    webhook_tasks.add(task)
+    task.add_done_callback(webhook_tasks.discard)
+    return {"ok": True}
 
-@app.get("/users/{user_id}/recipes")
-async def get_user_recipes(user_id: int, db: AsyncSession = Depends(get_db)):
+@app.get("/metrics")
+async def metrics():
+    return {
+        "recipe_cache": recipe_cache.stats(),
+        "local_recipes": recipe_engine.stats(),
+        "categorizer": categorizer.stats(),
+        "generation_flight": chef_agent.generation_flight.stats(),
+        "user_cache": user_cache.stats(),
+        "db_pool": get_pool_stats(),
+        "recipe_queue": await recipe_queue.stats(),
+        "rate_limit": user_limiter.stats(),
+        "gigachat_admission": gigachat_client.admission.stats(),
+        "gigachat_breaker": gigachat_client.breaker.stats(),
+        "gigachat_tokens": token_usage.stats(),
+        "gigachat_json": gigachat_client.json_stats(),
+        "suggestions": suggestion_buffer.stats(),
+        "speculation": speculator.stats()
+    }
+
+@app.get("/users/{user_id}", response_model=UserOut)
+async def get_user(user_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
-        "SELECT * FROM recipes WHERE user_id = :user_id ORDER BY created_at DESC",
-        {"user_id": user_id}
+        select(
+            User.telegram_id, User.username, User.first_name, User.last_name,
+            User.dietary_preferences, User.allergies, User.cooking_skill, User.created_at
+        ).where(User.telegram_id == user_id)
     )
-    recipes = result.fetchall()
-    return [dict(recipe) for recipe in recipes]
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Профиль маленький и меняется на месте, поэтому ETag считается по его содержимому
+    user = UserOut.model_validate(row)
+    etag = make_etag(user.model_dump_json())
+    if is_not_modified(request, etag):
+        return not_modified(etag, None, "private, no-cache")
+    return cached_json(user, etag, None, "private, no-cache")
 
-async def start_bot():
-    print(" Бот запускается...")
+@app.get("/users/{user_id}/recipes", response_model=RecipePageOut)
+async def get_user_recipes(
+    user_id: int,
+    request: Request,
+    limit: int = Query(config.API_PAGE_SIZE, ge=1, le=config.API_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Страница истории без текста рецептов: after - следующая (старее), before - предыдущая (новее).
+    Клиент, опрашивающий список, получает 304, пока не появился новый рецепт"""
+    latest = await latest_recipe(db, user_id)
+    last_modified = latest[1] if latest else None
+    etag = make_etag(user_id, latest, limit, after, before)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, "private, no-cache")
+    
     try:
-        # Отключаем вебхук на всякий случай
-        await bot.delete_webhook(drop_pending_updates=True)
-        print("✅ Вебхук отключен")
-        
-        # Выводим отладочную информацию
-        bot_info = await bot.get_me()
-        print(f"✅ Бот авторизован: {bot_info.first_name} (@{bot_info.username})")
-        
-        print("🔄 Начинаем обработку сообщений...")
-        await dp.start_polling(bot)
-    except Exception as e:
-        print(f"❌ Ошибка запуска бота: {e}")
+        page = await list_recipes(db, user_id, limit, after=after, before=before)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cached_json(RecipePageOut.model_validate(vars(page)), etag, last_modified, "private, no-cache")
+
+@app.get("/users/{user_id}/recipes/search", response_model=RecipeSearchOut)
+async def search_user_recipes(
+    user_id: int,
+    q: Optional[str] = Query(None, max_length=200),
+    ingredients: Optional[str] = Query(None, description="Продукты через запятую, нужны все"),
+    limit: int = Query(config.API_PAGE_SIZE, ge=1, le=config.API_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Полнотекстовый поиск (q) и/или поиск по продуктам, результаты по убыванию релевантности"""
+    names = [name.strip() for name in (ingredients or "").split(",") if name.strip()]
+    if not (q and q.strip()) and not names:
+        raise HTTPException(status_code=400, detail="Either q or ingredients is required")
+    page = await search_recipes(db, user_id, q.strip() if q else None, names, limit, offset)
+    return ORJSONResponse(content=RecipeSearchOut.model_validate(vars(page)).model_dump())
+
+@app.get("/users/{user_id}/recipes/{recipe_id}", response_model=RecipeOut)
+async def get_user_recipe(user_id: int, recipe_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # Сохраненный рецепт не меняется, поэтому сначала проверяем его версию без чтения текста
+    created_at = await recipe_created_at(db, user_id, recipe_id)
+    if created_at is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    etag = make_etag("recipe", recipe_id, created_at)
+    if is_not_modified(request, etag, created_at):
+        return not_modified(etag, created_at, "private, max-age=86400")
+    
+    recipe = await get_recipe(db, user_id, recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return cached_json(RecipeOut.model_validate(recipe), etag, created_at, "private, max-age=86400")
 
 if __name__ == "__main__":
     import uvicorn
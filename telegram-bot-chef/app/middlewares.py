@@ -0,0 +1,68 @@
+import math
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message, TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rate_limit import UserRateLimiter
+
+class LazySession:
+    """Сессия БД, которая создается только при первом обращении к ней"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Передает обработчикам ленивую сессию БД под ключом db и закрывает ее после обработки"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        db = LazySession(self.session_factory)
+        data["db"] = db
+        try:
+            return await handler(event, data)
+        finally:
+            await db.close()
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничивает частоту сообщений, обработчики которых помечены флагом llm"""
+
+    def __init__(self, limiter: UserRateLimiter):
+        self.limiter = limiter
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not get_flag(data, "llm") or not isinstance(event, Message) or not event.from_user:
+            return await handler(event, data)
+
+        retry_after = self.limiter.hit(event.from_user.id)
+        if retry_after:
+            print(f"⚠️ Пользователь {event.from_user.id} превысил лимит запросов")
+            await event.answer(f"⏳ Слишком много запросов. Попробуйте снова через {math.ceil(retry_after)} сек.")
+            return None
+        return await handler(event, data)
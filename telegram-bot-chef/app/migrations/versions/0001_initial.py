@@ -0,0 +1,66 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("telegram_id", sa.Integer()),
+        sa.Column("username", sa.String(100)),
+        sa.Column("first_name", sa.String(100)),
+        sa.Column("last_name", sa.String(100)),
+        sa.Column("dietary_preferences", sa.JSON()),
+        sa.Column("allergies", sa.JSON()),
+        sa.Column("cooking_skill", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+    op.create_table(
+        "fridge_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("ingredient_name", sa.String(100)),
+        sa.Column("quantity", sa.String(100)),
+        sa.Column("category", sa.String(50)),
+        sa.Column("expires_in", sa.Integer()),
+    )
+    op.create_index("ix_fridge_items_id", "fridge_items", ["id"])
+    op.create_index("ix_fridge_items_user_id", "fridge_items", ["user_id"])
+
+    op.create_table(
+        "recipes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("title", sa.String(200)),
+        sa.Column("ingredients", sa.JSON()),
+        sa.Column("instructions", sa.Text()),
+        sa.Column("cooking_time", sa.Integer()),
+        sa.Column("difficulty", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_recipes_id", "recipes", ["id"])
+    op.create_index("ix_recipes_user_id", "recipes", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("recipes")
+    op.drop_table("fridge_items")
+    op.drop_table("users")
@@ -0,0 +1,88 @@
+"""recipe cache, fsm states, recipe jobs, parsed fridge items
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing(table: str):
+    """Колонки таблицы или None, если ее нет. До появления миграций часть схемы
+    могли создать вручную, такие колонки, таблицы и индексы пропускаем"""
+    if context.is_offline_mode():
+        return None
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    # Старые записи без этих полей разбираются при чтении (ParsedIngredient.from_row)
+    fridge_columns = _existing("fridge_items") or set()
+    for column in (
+        sa.Column("canonical_name", sa.String(100)),
+        sa.Column("amount", sa.Float()),
+        sa.Column("unit", sa.String(20)),
+    ):
+        if column.name not in fridge_columns:
+            op.add_column("fridge_items", column)
+
+    if _existing("recipe_cache") is None:
+        op.create_table(
+            "recipe_cache",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("cache_key", sa.String(64)),
+            sa.Column("recipe", sa.JSON()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    op.create_index("ix_recipe_cache_id", "recipe_cache", ["id"], if_not_exists=True)
+    op.create_index("ix_recipe_cache_cache_key", "recipe_cache", ["cache_key"], if_not_exists=True)
+    op.create_index("ix_recipe_cache_created_at", "recipe_cache", ["created_at"], if_not_exists=True)
+
+    if _existing("fsm_states") is None:
+        op.create_table(
+            "fsm_states",
+            sa.Column("key", sa.String(255), primary_key=True),
+            sa.Column("state", sa.String(255)),
+            sa.Column("data", sa.JSON()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    if _existing("recipe_jobs") is None:
+        op.create_table(
+            "recipe_jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("chat_id", sa.BigInteger(), nullable=False),
+            sa.Column("message_id", sa.Integer()),
+            sa.Column("status", sa.String(20)),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("started_at", sa.DateTime(timezone=True)),
+        )
+    op.create_index("ix_recipe_jobs_id", "recipe_jobs", ["id"], if_not_exists=True)
+    op.create_index("ix_recipe_jobs_status", "recipe_jobs", ["status"], if_not_exists=True)
+    op.create_index(
+        "uq_recipe_jobs_active_user", "recipe_jobs", ["user_id"],
+        unique=True, postgresql_where=sa.text("status IN ('pending', 'running')"), if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("recipe_jobs")
+    op.drop_table("fsm_states")
+    op.drop_table("recipe_cache")
+    op.drop_column("fridge_items", "unit")
+    op.drop_column("fridge_items", "amount")
+    op.drop_column("fridge_items", "canonical_name")
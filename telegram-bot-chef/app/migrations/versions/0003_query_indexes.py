@@ -0,0 +1,65 @@
+"""indexes for hot queries, JSONB preferences, BIGINT telegram ids
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Идентификаторы Telegram не помещаются в INTEGER
+_TELEGRAM_ID_COLUMNS = [
+    ("users", "telegram_id"),
+    ("fridge_items", "user_id"),
+    ("recipes", "user_id"),
+    ("recipe_jobs", "user_id"),
+]
+
+
+def upgrade() -> None:
+    for table, column in _TELEGRAM_ID_COLUMNS:
+        op.alter_column(table, column, type_=sa.BigInteger(), existing_type=sa.Integer())
+
+    for column in ("dietary_preferences", "allergies"):
+        op.alter_column(
+            "users", column,
+            type_=postgresql.JSONB(), existing_type=sa.JSON(),
+            postgresql_using=f"{column}::jsonb"
+        )
+        op.create_index(f"ix_users_{column}", "users", [column], postgresql_using="gin")
+
+    # Составные индексы начинаются с user_id и заменяют одиночные
+    op.create_index("ix_recipes_user_created", "recipes", ["user_id", sa.text("created_at DESC")])
+    op.drop_index("ix_recipes_user_id", table_name="recipes")
+    op.create_index("ix_fridge_items_user_ingredient", "fridge_items", ["user_id", "ingredient_name"])
+    op.create_index("ix_fridge_items_user_canonical", "fridge_items", ["user_id", "canonical_name"])
+    op.drop_index("ix_fridge_items_user_id", table_name="fridge_items")
+
+
+def downgrade() -> None:
+    op.create_index("ix_fridge_items_user_id", "fridge_items", ["user_id"])
+    op.drop_index("ix_fridge_items_user_canonical", table_name="fridge_items")
+    op.drop_index("ix_fridge_items_user_ingredient", table_name="fridge_items")
+    op.create_index("ix_recipes_user_id", "recipes", ["user_id"])
+    op.drop_index("ix_recipes_user_created", table_name="recipes")
+
+    for column in ("dietary_preferences", "allergies"):
+        op.drop_index(f"ix_users_{column}", table_name="users")
+        op.alter_column(
+            "users", column,
+            type_=sa.JSON(), existing_type=postgresql.JSONB(),
+            postgresql_using=f"{column}::json"
+        )
+
+    for table, column in _TELEGRAM_ID_COLUMNS:
+        op.alter_column(table, column, type_=sa.Integer(), existing_type=sa.BigInteger())
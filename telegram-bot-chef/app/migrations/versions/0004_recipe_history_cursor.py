@@ -0,0 +1,30 @@
+"""recipe history index covering the (created_at, id) cursor
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_recipes_user_created_id", "recipes",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")]
+    )
+    op.drop_index("ix_recipes_user_created", table_name="recipes")
+
+
+def downgrade() -> None:
+    op.create_index("ix_recipes_user_created", "recipes", ["user_id", sa.text("created_at DESC")])
+    op.drop_index("ix_recipes_user_created_id", table_name="recipes")
@@ -0,0 +1,118 @@
+"""full-text and ingredient search over saved recipes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('russian', coalesce(ingredients, '[]'::jsonb), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(instructions, '')), 'C')"
+)
+BATCH_SIZE = 1000
+
+recipes = sa.table(
+    "recipes",
+    sa.column("id", sa.Integer),
+    sa.column("ingredients", postgresql.JSONB),
+    sa.column("ingredient_keys", postgresql.JSONB),
+)
+
+
+# Копия recipe_cache.ingredient_keys на момент миграции
+_UNITS = {
+    "г", "гр", "грамм", "граммов", "кг", "мг", "мл", "л", "литр", "литра",
+    "шт", "шт.", "штук", "штуки", "штука", "ст.л.", "ч.л.", "ст.л", "ч.л",
+    "уп", "уп.", "упаковка", "упаковки", "пачка", "пачки", "банка", "банки",
+    "зубчик", "зубчика", "зубчиков", "пучок", "пучка", "стакан", "стакана"
+}
+_QUANTITY_RE = re.compile(r"^\d+(?:[.,/]\d+)?\D{0,6}$")
+
+
+def _normalize_ingredient(ingredient: str) -> str:
+    words = []
+    for token in ingredient.lower().replace("ё", "е").split():
+        token = token.strip(",;:-–—")
+        if not token or token in _UNITS or _QUANTITY_RE.match(token):
+            continue
+        words.append(token)
+    return " ".join(words)
+
+
+def _ingredient_keys(ingredients) -> list:
+    if not isinstance(ingredients, list):
+        return []
+    keys = (_normalize_ingredient(str(ingredient).split(" - ")[0]) for ingredient in ingredients)
+    return sorted({key for key in keys if key})
+
+
+def _backfill_ingredient_keys(connection) -> None:
+    """Заполняет ingredient_keys существующих рецептов пачками по id"""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(recipes.c.id, recipes.c.ingredients)
+            .where(recipes.c.id > last_id)
+            .order_by(recipes.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            sa.update(recipes)
+            .where(recipes.c.id == sa.bindparam("recipe_id"))
+            .values(ingredient_keys=sa.bindparam("keys", type_=postgresql.JSONB)),
+            [{"recipe_id": row.id, "keys": _ingredient_keys(row.ingredients)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError("Ревизия 0005 заполняет ключи ингредиентов и выполняется только с подключением к базе")
+
+    op.alter_column(
+        "recipes", "ingredients",
+        type_=postgresql.JSONB(), existing_type=sa.JSON(),
+        postgresql_using="ingredients::jsonb"
+    )
+    op.add_column("recipes", sa.Column("ingredient_keys", postgresql.JSONB()))
+    # Ингредиенты хранятся строками "название - количество"; ключи считаются той же
+    # нормализацией, что и у новых рецептов, иначе "помидоры 3 шт" не найдется по "помидоры"
+    _backfill_ingredient_keys(op.get_bind())
+    op.create_index(
+        "ix_recipes_ingredient_keys", "recipes", ["ingredient_keys"],
+        postgresql_using="gin", postgresql_ops={"ingredient_keys": "jsonb_path_ops"}
+    )
+
+    op.add_column(
+        "recipes",
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True))
+    )
+    op.create_index("ix_recipes_search_vector", "recipes", ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recipes_search_vector", table_name="recipes")
+    op.drop_column("recipes", "search_vector")
+    op.drop_index("ix_recipes_ingredient_keys", table_name="recipes")
+    op.drop_column("recipes", "ingredient_keys")
+    op.alter_column(
+        "recipes", "ingredients",
+        type_=sa.JSON(), existing_type=postgresql.JSONB(),
+        postgresql_using="ingredients::json"
+    )
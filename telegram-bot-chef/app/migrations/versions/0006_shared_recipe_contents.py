@@ -0,0 +1,189 @@
+"""shared recipe contents deduplicated by content hash
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:00:00
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('russian', coalesce(ingredients, '[]'::jsonb), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(instructions, '')), 'C')"
+)
+BATCH_SIZE = 1000
+
+_CONTENT_COLUMNS = ("title", "ingredients", "ingredient_keys", "instructions", "cooking_time", "difficulty")
+
+recipes = sa.table(
+    "recipes",
+    sa.column("id", sa.Integer),
+    sa.column("content_id", sa.Integer),
+    sa.column("title", sa.String),
+    sa.column("ingredients", postgresql.JSONB),
+    sa.column("ingredient_keys", postgresql.JSONB),
+    sa.column("instructions", sa.Text),
+    sa.column("cooking_time", sa.Integer),
+    sa.column("difficulty", sa.String),
+)
+recipe_contents = sa.table(
+    "recipe_contents",
+    sa.column("id", sa.Integer),
+    sa.column("content_hash", sa.String),
+    sa.column("title", sa.String),
+    sa.column("ingredients", postgresql.JSONB),
+    sa.column("ingredient_keys", postgresql.JSONB),
+    sa.column("instructions", sa.Text),
+    sa.column("cooking_time", sa.Integer),
+    sa.column("difficulty", sa.String),
+)
+
+
+# Копия recipe_store.content_hash на момент миграции
+def _normalize_text(value) -> str:
+    return " ".join(str(value or "").lower().replace("ё", "е").split())
+
+
+def _content_hash(recipe: dict) -> str:
+    payload = {
+        "title": _normalize_text(recipe.get("title")),
+        "ingredients": [_normalize_text(item) for item in recipe.get("ingredients") or []],
+        "instructions": [_normalize_text(step) for step in recipe.get("instructions") or [] if step.strip()],
+        "cooking_time": recipe.get("cooking_time"),
+        "difficulty": _normalize_text(recipe.get("difficulty"))
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _move_contents(connection) -> None:
+    """Переносит тексты рецептов в recipe_contents пачками, схлопывая одинаковые"""
+    while True:
+        rows = connection.execute(
+            sa.select(recipes.c.id, *(recipes.c[name] for name in _CONTENT_COLUMNS))
+            .where(recipes.c.content_id.is_(None))
+            .order_by(recipes.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+
+        groups = {}
+        for row in rows:
+            ingredients = row.ingredients if isinstance(row.ingredients, list) else []
+            content = {
+                "title": row.title,
+                "ingredients": ingredients,
+                "ingredient_keys": row.ingredient_keys or [],
+                "instructions": row.instructions,
+                "cooking_time": row.cooking_time,
+                "difficulty": row.difficulty
+            }
+            key = _content_hash(dict(content, instructions=(row.instructions or "").splitlines()))
+            groups.setdefault(key, (content, []))[1].append(row.id)
+
+        for key, (content, ids) in groups.items():
+            content_id = connection.execute(
+                postgresql.insert(recipe_contents).values(content_hash=key, **content)
+                .on_conflict_do_nothing(index_elements=["content_hash"])
+                .returning(recipe_contents.c.id)
+            ).scalar()
+            if content_id is None:
+                # Такой текст уже перенесен из предыдущей пачки
+                content_id = connection.execute(
+                    sa.select(recipe_contents.c.id).where(recipe_contents.c.content_hash == key)
+                ).scalar_one()
+            connection.execute(
+                sa.update(recipes).where(recipes.c.id.in_(ids)).values(content_id=content_id)
+            )
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError("Ревизия 0006 переносит данные и выполняется только с подключением к базе")
+
+    op.create_table(
+        "recipe_contents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content_hash", sa.String(64), nullable=False, unique=True),
+        sa.Column("title", sa.String(200)),
+        sa.Column("ingredients", postgresql.JSONB()),
+        sa.Column("ingredient_keys", postgresql.JSONB()),
+        sa.Column("instructions", sa.Text()),
+        sa.Column("cooking_time", sa.Integer()),
+        sa.Column("difficulty", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)),
+    )
+
+    op.add_column("recipes", sa.Column("content_id", sa.Integer(), sa.ForeignKey("recipe_contents.id")))
+    _move_contents(op.get_bind())
+    op.alter_column("recipes", "content_id", nullable=False)
+
+    # Индексы поиска переезжают вместе с текстом; строятся после переноса данных
+    op.create_index("ix_recipe_contents_search_vector", "recipe_contents", ["search_vector"], postgresql_using="gin")
+    op.create_index(
+        "ix_recipe_contents_ingredient_keys", "recipe_contents", ["ingredient_keys"],
+        postgresql_using="gin", postgresql_ops={"ingredient_keys": "jsonb_path_ops"}
+    )
+    # Соединение истории с текстом при поиске и проверка внешнего ключа при удалении текста
+    op.create_index("ix_recipes_content_id", "recipes", ["content_id"])
+    op.drop_index("ix_recipes_search_vector", table_name="recipes")
+    op.drop_index("ix_recipes_ingredient_keys", table_name="recipes")
+    op.drop_column("recipes", "search_vector")
+    for name in _CONTENT_COLUMNS:
+        op.drop_column("recipes", name)
+
+    # Общий кэш теперь ссылается на тексты рецептов; старые записи - только кэш, их не переносим
+    op.execute("DELETE FROM recipe_cache")
+    op.drop_column("recipe_cache", "recipe")
+    op.add_column(
+        "recipe_cache",
+        sa.Column("content_id", sa.Integer(), sa.ForeignKey("recipe_contents.id"), nullable=False)
+    )
+    op.create_index("ix_recipe_cache_content_id", "recipe_cache", ["content_id"])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM recipe_cache")
+    op.drop_index("ix_recipe_cache_content_id", table_name="recipe_cache")
+    op.drop_column("recipe_cache", "content_id")
+    op.add_column("recipe_cache", sa.Column("recipe", sa.JSON()))
+
+    op.add_column("recipes", sa.Column("title", sa.String(200)))
+    op.add_column("recipes", sa.Column("ingredients", postgresql.JSONB()))
+    op.add_column("recipes", sa.Column("ingredient_keys", postgresql.JSONB()))
+    op.add_column("recipes", sa.Column("instructions", sa.Text()))
+    op.add_column("recipes", sa.Column("cooking_time", sa.Integer()))
+    op.add_column("recipes", sa.Column("difficulty", sa.String(50)))
+    op.execute(f"""
+        UPDATE recipes r
+        SET {", ".join(f"{name} = c.{name}" for name in _CONTENT_COLUMNS)}
+        FROM recipe_contents c
+        WHERE c.id = r.content_id
+    """)
+    op.add_column(
+        "recipes",
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True))
+    )
+    op.create_index("ix_recipes_search_vector", "recipes", ["search_vector"], postgresql_using="gin")
+    op.create_index(
+        "ix_recipes_ingredient_keys", "recipes", ["ingredient_keys"],
+        postgresql_using="gin", postgresql_ops={"ingredient_keys": "jsonb_path_ops"}
+    )
+    op.drop_index("ix_recipes_content_id", table_name="recipes")
+    op.drop_column("recipes", "content_id")
+    op.drop_table("recipe_contents")
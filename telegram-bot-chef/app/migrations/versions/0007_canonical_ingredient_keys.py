@@ -0,0 +1,98 @@
+"""ingredient search keys resolved through the local recipe catalog
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+import re
+from typing import Callable, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+recipe_contents = sa.table(
+    "recipe_contents",
+    sa.column("id", sa.Integer),
+    sa.column("ingredients", postgresql.JSONB),
+    sa.column("ingredient_keys", postgresql.JSONB),
+)
+
+
+# Копия recipe_cache.ingredient_keys до этой ревизии - для downgrade
+_UNITS = {
+    "г", "гр", "грамм", "граммов", "кг", "мг", "мл", "л", "литр", "литра",
+    "шт", "шт.", "штук", "штуки", "штука", "ст.л.", "ч.л.", "ст.л", "ч.л",
+    "уп", "уп.", "упаковка", "упаковки", "пачка", "пачки", "банка", "банки",
+    "зубчик", "зубчика", "зубчиков", "пучок", "пучка", "стакан", "стакана"
+}
+_QUANTITY_RE = re.compile(r"^\d+(?:[.,/]\d+)?\D{0,6}$")
+
+
+def _normalize_ingredient(ingredient: str) -> str:
+    words = []
+    for token in ingredient.lower().replace("ё", "е").split():
+        token = token.strip(",;:-–—")
+        if not token or token in _UNITS or _QUANTITY_RE.match(token):
+            continue
+        words.append(token)
+    return " ".join(words)
+
+
+def _normalized_keys(ingredients: list) -> list:
+    keys = (_normalize_ingredient(ingredient.split(" - ")[0]) for ingredient in ingredients)
+    return sorted({key for key in keys if key})
+
+
+def _rewrite_keys(connection, keys_of: Callable[[list], list]) -> None:
+    """Пересчитывает ingredient_keys всех текстов рецептов пачками по id"""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(recipe_contents.c.id, recipe_contents.c.ingredients)
+            .where(recipe_contents.c.id > last_id)
+            .order_by(recipe_contents.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            sa.update(recipe_contents)
+            .where(recipe_contents.c.id == sa.bindparam("content_id"))
+            .values(ingredient_keys=sa.bindparam("keys", type_=postgresql.JSONB)),
+            [
+                {
+                    "content_id": row.id,
+                    "keys": keys_of([str(item) for item in row.ingredients]) if isinstance(row.ingredients, list) else []
+                }
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError("Ревизия 0007 пересчитывает ключи ингредиентов и выполняется только с подключением к базе")
+
+    # Ключи зависят от синонимов локального каталога (data/recipes.json), а не только от кода,
+    # поэтому здесь намеренно используется функция приложения: сохраненные ключи должны
+    # совпадать с теми, в которые она превращает поисковый запрос
+    from recipe_cache import ingredient_keys
+    _rewrite_keys(op.get_bind(), ingredient_keys)
+
+
+def downgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError("Ревизия 0007 пересчитывает ключи ингредиентов и выполняется только с подключением к базе")
+
+    _rewrite_keys(op.get_bind(), _normalized_keys)
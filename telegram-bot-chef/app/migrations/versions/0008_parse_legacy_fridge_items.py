@@ -0,0 +1,86 @@
+"""parse fridge items stored before the structured columns
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+fridge_items = sa.table(
+    "fridge_items",
+    sa.column("id", sa.Integer),
+    sa.column("ingredient_name", sa.String),
+    sa.column("canonical_name", sa.String),
+    sa.column("quantity", sa.String),
+    sa.column("amount", sa.Float),
+    sa.column("unit", sa.String),
+    sa.column("category", sa.String),
+)
+
+
+def _parse_legacy_items(connection) -> None:
+    """Разбирает записи без canonical_name пачками по id"""
+    # Разбор должен совпадать с тем, что приложение пишет для новых продуктов: по canonical_name
+    # add_fridge_items ищет дубли, поэтому здесь намеренно используется парсер приложения
+    from ingredient_parser import parse_ingredient
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(fridge_items.c.id, fridge_items.c.ingredient_name)
+            .where(fridge_items.c.id > last_id, fridge_items.c.canonical_name.is_(None))
+            .order_by(fridge_items.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        params = []
+        for row in rows:
+            item = parse_ingredient(row.ingredient_name or "")
+            params.append({
+                "item_id": row.id,
+                "name": item.name,
+                "canonical": item.canonical_name,
+                "quantity": item.quantity,
+                "amount": item.amount,
+                "unit": item.unit,
+                "category": item.category,
+            })
+        connection.execute(
+            sa.update(fridge_items)
+            .where(fridge_items.c.id == sa.bindparam("item_id"))
+            .values(
+                ingredient_name=sa.bindparam("name"),
+                canonical_name=sa.bindparam("canonical"),
+                quantity=sa.bindparam("quantity"),
+                amount=sa.bindparam("amount"),
+                unit=sa.bindparam("unit"),
+                category=sa.bindparam("category"),
+            ),
+            params
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError("Ревизия 0008 разбирает продукты холодильника и выполняется только с подключением к базе")
+
+    _parse_legacy_items(op.get_bind())
+
+
+def downgrade() -> None:
+    # Исходный текст старых записей не сохранялся; разобранные поля остаются валидными и для 0007
+    pass
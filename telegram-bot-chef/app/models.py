@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Boolean
+from sqlalchemy import Column, Computed, ForeignKey, Integer, BigInteger, String, Text, DateTime, JSON, Boolean, Float, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 
 Base = declarative_base()
@@ -8,33 +10,120 @@ class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
-    telegram_id = Column(Integer, unique=True, index=True)
+    telegram_id = Column(BigInteger, unique=True, index=True)
     username = Column(String(100))
     first_name = Column(String(100))
     last_name = Column(String(100))
-    dietary_preferences = Column(JSON, default=[])
-    allergies = Column(JSON, default=[])
+    dietary_preferences = Column(JSONB, default=[])
+    allergies = Column(JSONB, default=[])
     cooking_skill = Column(String(50), default="новичок")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # GIN-индексы для фильтров вида allergies @> '["орехи"]'
+    __table_args__ = (
+        Index("ix_users_dietary_preferences", "dietary_preferences", postgresql_using="gin"),
+        Index("ix_users_allergies", "allergies", postgresql_using="gin"),
+    )
 
 class FridgeItem(Base):
     __tablename__ = "fridge_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(BigInteger)
     ingredient_name = Column(String(100))
+    # Заполняются парсером при добавлении: "Куриное филе 1,5 кг" -> куриное филе, 1500, г
+    canonical_name = Column(String(100))
     quantity = Column(String(100))
+    amount = Column(Float)
+    unit = Column(String(20))
     category = Column(String(50))
     expires_in = Column(Integer)
+    
+    # Индексы начинаются с user_id, поэтому заменяют отдельный индекс по нему
+    __table_args__ = (
+        Index("ix_fridge_items_user_ingredient", "user_id", "ingredient_name"),
+        Index("ix_fridge_items_user_canonical", "user_id", "canonical_name"),
+    )
 
-class Recipe(Base):
-    __tablename__ = "recipes"
+class RecipeContent(Base):
+    """Текст рецепта, общий для всех пользователей: одинаковые рецепты хранятся один раз"""
+    __tablename__ = "recipe_contents"
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    id = Column(Integer, primary_key=True)
+    # sha256 нормализованного рецепта (recipe_store.content_hash)
+    content_hash = Column(String(64), nullable=False, unique=True)
     title = Column(String(200))
-    ingredients = Column(JSON)
+    ingredients = Column(JSONB)
+    # Канонические названия продуктов рецепта для поиска вида ingredient_keys @> '["яйца"]'
+    ingredient_keys = Column(JSONB, default=[])
     instructions = Column(Text)
     cooking_time = Column(Integer)
     difficulty = Column(String(50))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Полнотекстовый индекс: название важнее ингредиентов, ингредиенты важнее шагов.
+    # Нужен только в условиях запросов, поэтому не загружается вместе с рецептом
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+            "setweight(jsonb_to_tsvector('russian', coalesce(ingredients, '[]'::jsonb), '[\"string\"]'), 'B') || "
+            "setweight(to_tsvector('russian', coalesce(instructions, '')), 'C')",
+            persisted=True
+        )
+    ))
+    
+    __table_args__ = (
+        Index("ix_recipe_contents_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_recipe_contents_ingredient_keys", "ingredient_keys",
+            postgresql_using="gin", postgresql_ops={"ingredient_keys": "jsonb_path_ops"}
+        ),
+    )
+
+class Recipe(Base):
+    """История рецептов пользователя: ссылка на общий текст рецепта"""
+    __tablename__ = "recipes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(BigInteger)
+    content_id = Column(Integer, ForeignKey("recipe_contents.id"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Последние рецепты пользователя и страницы истории по курсору (created_at, id)
+# читаются одним проходом по индексу, без сортировки
+Index("ix_recipes_user_created_id", Recipe.user_id, Recipe.created_at.desc(), Recipe.id.desc())
+
+class RecipeCacheEntry(Base):
+    __tablename__ = "recipe_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), index=True)
+    content_id = Column(Integer, ForeignKey("recipe_contents.id"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+    
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255))
+    data = Column(JSON, default={})
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RecipeJob(Base):
+    __tablename__ = "recipe_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(BigInteger, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(Integer)
+    status = Column(String(20), default="pending", index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    
+    # У пользователя может быть только одна ожидающая или выполняемая задача
+    __table_args__ = (
+        Index(
+            "uq_recipe_jobs_active_user", "user_id",
+            unique=True, postgresql_where=text("status IN ('pending', 'running')")
+        ),
+    )
\ No newline at end of file
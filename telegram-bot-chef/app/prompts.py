@@ -0,0 +1,195 @@
+import math
+from typing import Any, Dict, List
+
+from gigachat.models import Chat, Messages, MessagesRole
+
+# Все неизменные инструкции собраны в системном сообщении, а данные пользователя идут в самом конце.
+# Так начало запроса одинаково для всех пользователей и может кэшироваться на стороне GigaChat
+RECIPE_SYSTEM_PROMPT = """Ты - профессиональный шеф-повар. Твоя задача - создавать рецепты ИСКЛЮЧИТЕЛЬНО из указанных пользователем ингредиентов.
+
+СТРОГИЕ ПРАВИЛА:
+1. Используй ТОЛЬКО те ингредиенты, которые указал пользователь
+2. Можешь добавить только базовые специи: соль, перец, растительное масло, сахар, вода
+3. НИКОГДА не добавляй дополнительные ингредиенты, которых нет у пользователя
+4. Если ингредиентов недостаточно - предложи максимально простой вариант
+5. Всегда отвечай на русском языке
+6. Строго соблюдай указанный формат ответа
+
+ТРЕБОВАНИЯ К РЕЦЕПТУ:
+1. Учитывай уровень навыков, диетические предпочтения и аллергии пользователя
+2. Сделай рецепт практичным и выполнимым
+3. Укажи точное время приготовления
+4. Оцени сложность приготовления
+
+ФОРМАТ ОТВЕТА (ОБЯЗАТЕЛЬНО СОБЛЮДАЙ!):
+
+НАЗВАНИЕ РЕЦЕПТА (с эмодзи)
+
+ИНГРЕДИЕНТЫ:
+- ингредиент 1 - количество (только из списка пользователя)
+- ингредиент 2 - количество (только из списка пользователя)
+...
+
+ПРИГОТОВЛЕНИЕ:
+1. Шаг 1 приготовления
+2. Шаг 2 приготовления
+...
+
+ВРЕМЯ ПРИГОТОВЛЕНИЯ: X минут
+СЛОЖНОСТЬ: легко/средне/сложно"""
+
+_RECIPE_RULES = RECIPE_SYSTEM_PROMPT.split("ФОРМАТ ОТВЕТА")[0]
+_RECIPE_JSON_SCHEMA = """{
+  "title": "название рецепта с эмодзи",
+  "ingredients": [{"name": "ингредиент из списка пользователя", "quantity": "количество"}],
+  "steps": ["шаг приготовления", "..."],
+  "cooking_time": время приготовления в минутах (целое число),
+  "difficulty": "легко" | "средне" | "сложно"
+}"""
+
+# Тот же рецепт, но ответом должен быть JSON по схеме schemas.RecipeSchema
+RECIPE_JSON_SYSTEM_PROMPT = _RECIPE_RULES + """ФОРМАТ ОТВЕТА: только JSON-объект без пояснений и без ```, строго по схеме:
+""" + _RECIPE_JSON_SCHEMA
+
+# Несколько разных рецептов за один запрос, схема schemas.RecipeBatchSchema.
+# Число рецептов передается в сообщении пользователя, чтобы системное сообщение не менялось
+RECIPE_BATCH_SYSTEM_PROMPT = _RECIPE_RULES + """ФОРМАТ ОТВЕТА: только JSON-объект без пояснений и без ```, строго по схеме:
+{"recipes": [рецепт, рецепт, ...]}
+где каждый рецепт:
+""" + _RECIPE_JSON_SCHEMA + """
+Рецепты должны быть разными блюдами, а не вариациями одного блюда."""
+
+_RECIPE_REPAIR_TEMPLATE = """Ответ не соответствует схеме: {errors}
+Верни исправленный рецепт - только JSON-объект по схеме из инструкции, без пояснений."""
+
+_RECIPE_BATCH_REPAIR_TEMPLATE = """Ответ не соответствует схеме: {errors}
+Верни исправленный ответ целиком, все разные рецепты ({count}) - только JSON-объект {{"recipes": [...]}} по схеме из инструкции, без пояснений."""
+
+_RECIPE_REQUEST_TEMPLATE = """ДОСТУПНЫЕ ИНГРЕДИЕНТЫ (ЭТО ВСЕ, ЧТО ЕСТЬ):
+{ingredients}
+
+О ПОЛЬЗОВАТЕЛЕ:
+- Уровень кулинарных навыков: {skill}
+- Диетические предпочтения: {diet}
+- Аллергии: {allergies}
+
+НЕ ДОБАВЛЯЙ НИКАКИХ ДРУГИХ ИНГРЕДИЕНТОВ, КРОМЕ ТЕХ, ЧТО В СПИСКЕ!"""
+
+_RECIPE_VARIANTS_TEMPLATE = "\n\nПРЕДЛОЖИ РАЗНЫХ РЕЦЕПТОВ: {count}"
+
+_RECIPE_SYSTEM_MESSAGE = Messages(role=MessagesRole.SYSTEM, content=RECIPE_SYSTEM_PROMPT)
+_RECIPE_JSON_SYSTEM_MESSAGE = Messages(role=MessagesRole.SYSTEM, content=RECIPE_JSON_SYSTEM_PROMPT)
+_RECIPE_BATCH_SYSTEM_MESSAGE = Messages(role=MessagesRole.SYSTEM, content=RECIPE_BATCH_SYSTEM_PROMPT)
+
+RECIPE_MAX_TOKENS = 2000
+
+class TokenUsage:
+    """Учет токенов запросов и ответов GigaChat.
+    По ответам с точным usage уточняется, сколько символов в среднем приходится на токен"""
+
+    def __init__(self, chars_per_token: float = 3.0):
+        self.chars_per_token = chars_per_token
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = 0
+        self.trimmed = 0
+
+    def estimate(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def estimate_chat(self, chat: Chat) -> int:
+        return sum(self.estimate(message.content) for message in chat.messages)
+
+    def record(self, chat: Chat, completion: str, usage=None):
+        """Запоминает токены одного запроса: точные из usage или оценку, если usage нет"""
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            prompt_chars = sum(len(message.content) for message in chat.messages)
+            if prompt_tokens:
+                # Скользящее среднее, чтобы оценка подстраивалась под реальный токенизатор
+                self.chars_per_token = 0.9 * self.chars_per_token + 0.1 * (prompt_chars / prompt_tokens)
+        else:
+            prompt_tokens, completion_tokens = self.estimate_chat(chat), self.estimate(completion)
+            self.estimated += 1
+
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        print(f"📊 Токены: запрос {prompt_tokens}, ответ {completion_tokens}{' (оценка)' if usage is None else ''}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+            "avg_completion_tokens": round(self.completion_tokens / self.requests, 1) if self.requests else 0.0,
+            "estimated_requests": self.estimated,
+            "trimmed_prompts": self.trimmed,
+            "chars_per_token": round(self.chars_per_token, 2)
+        }
+
+token_usage = TokenUsage()
+
+def _fit_ingredients(ingredients: List[str], budget: int) -> str:
+    """Оставляет столько продуктов, сколько помещается в бюджет токенов"""
+    lines = []
+    used = 0
+    for ingredient in ingredients:
+        line = f"- {ingredient}"
+        cost = token_usage.estimate(line) + 1
+        if lines and used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+
+    omitted = len(ingredients) - len(lines)
+    if omitted:
+        token_usage.trimmed += 1
+        print(f"⚠️ Список продуктов сокращен до бюджета токенов, не вошло: {omitted}")
+    return "\n".join(lines)
+
+def build_recipe_chat(ingredients: List[str], user_preferences: Dict[str, Any], max_input_tokens: int,
+                      json_mode: bool = False, variants: int = 1) -> Chat:
+    """Собирает запрос на рецепт, укладывая список продуктов в max_input_tokens.
+    В json_mode модель просят ответить JSON-объектом вместо размеченного текста,
+    при variants > 1 - JSON со списком из variants разных рецептов"""
+    if variants > 1:
+        system_message = _RECIPE_BATCH_SYSTEM_MESSAGE
+    else:
+        system_message = _RECIPE_JSON_SYSTEM_MESSAGE if json_mode else _RECIPE_SYSTEM_MESSAGE
+    suffix = _RECIPE_VARIANTS_TEMPLATE.format(count=variants) if variants > 1 else ""
+    profile = {
+        "skill": user_preferences.get("cooking_skill") or "новичок",
+        "diet": ", ".join(user_preferences.get("dietary_preferences") or []) or "нет",
+        "allergies": ", ".join(user_preferences.get("allergies") or []) or "нет"
+    }
+    fixed_tokens = token_usage.estimate(system_message.content) + token_usage.estimate(
+        _RECIPE_REQUEST_TEMPLATE.format(ingredients="", **profile) + suffix
+    )
+    request = _RECIPE_REQUEST_TEMPLATE.format(
+        ingredients=_fit_ingredients(ingredients, max_input_tokens - fixed_tokens),
+        **profile
+    ) + suffix
+    return Chat(
+        messages=[system_message, Messages(role=MessagesRole.USER, content=request)],
+        temperature=0.7,
+        max_tokens=RECIPE_MAX_TOKENS * variants
+    )
+
+def build_repair_chat(chat: Chat, answer: str, errors: str, variants: int = 1) -> Chat:
+    """Продолжает диалог: показывает модели ее ответ и ошибки схемы и просит исправить.
+    Исправленный ответ должен быть той же формы, что и исходный, поэтому и лимит токенов тот же"""
+    if variants > 1:
+        repair = _RECIPE_BATCH_REPAIR_TEMPLATE.format(errors=errors, count=variants)
+    else:
+        repair = _RECIPE_REPAIR_TEMPLATE.format(errors=errors)
+    return Chat(
+        messages=chat.messages + [
+            Messages(role=MessagesRole.ASSISTANT, content=answer),
+            Messages(role=MessagesRole.USER, content=repair)
+        ],
+        temperature=0.3,
+        max_tokens=chat.max_tokens
+    )
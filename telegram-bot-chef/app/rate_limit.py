@@ -0,0 +1,148 @@
+import asyncio
+import time
+from typing import Any, Dict, Hashable
+
+from cache import LRUCache
+from config import config
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity в запасе.
+    Нулевой rate означает отсутствие лимита, и корзина для него не создается"""
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError(f"Скорость корзины токенов должна быть положительной: {rate}")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def try_consume(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def retry_after(self, tokens: float = 1.0) -> float:
+        """Через сколько секунд в корзине наберется нужное количество токенов"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        while not self.try_consume(tokens):
+            await asyncio.sleep(self.retry_after(tokens))
+
+class UserRateLimiter:
+    """Отдельная корзина токенов на каждого пользователя. per_minute <= 0 отключает лимит"""
+
+    def __init__(self, per_minute: float, burst: int, max_users: int):
+        self.enabled = per_minute > 0
+        self.rate = per_minute / 60
+        self.burst = burst
+        # Простаивающая корзина за это время наполняется целиком, поэтому ее можно забыть
+        self._buckets = LRUCache(max_users, ttl=burst / self.rate if self.enabled else 0)
+        self.allowed = 0
+        self.throttled = 0
+
+    def hit(self, user_id: Hashable) -> float:
+        """Списывает токен пользователя. Возвращает 0, если запрос разрешен,
+        иначе - через сколько секунд можно повторить"""
+        if not self.enabled:
+            self.allowed += 1
+            return 0.0
+        bucket = self._buckets.peek(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+        self._buckets.set(user_id, bucket)
+
+        if bucket.try_consume():
+            self.allowed += 1
+            return 0.0
+        self.throttled += 1
+        return bucket.retry_after()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tracked_users": len(self._buckets),
+            "allowed": self.allowed,
+            "throttled": self.throttled
+        }
+
+class AdmissionController:
+    """Общий бюджет запросов к внешнему API: не больше max_concurrency одновременно
+    и не чаще qps в секунду (с запасом burst)"""
+
+    def __init__(self, qps: float, burst: int, max_concurrency: int):
+        self.bucket = TokenBucket(qps, burst) if qps > 0 else None
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._slot_released = asyncio.Condition()
+        self.admitted = 0
+        self.waited = 0
+        self.degraded = 0
+
+    def has_capacity(self) -> bool:
+        """Можно ли выполнить запрос прямо сейчас, не вставая в ожидание"""
+        if self.in_flight >= self.max_concurrency:
+            return False
+        return self.bucket is None or self.bucket.available() >= 1
+
+    def should_degrade(self) -> bool:
+        """Проверяет бюджет и учитывает запрос как деградированный, если его нет"""
+        if self.has_capacity():
+            return False
+        self.degraded += 1
+        return True
+
+    async def acquire(self):
+        if not self.has_capacity():
+            self.waited += 1
+        async with self._slot_released:
+            await self._slot_released.wait_for(lambda: self.in_flight < self.max_concurrency)
+            self.in_flight += 1
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+        except BaseException:
+            await self.release()
+            raise
+        self.admitted += 1
+
+    async def release(self):
+        async with self._slot_released:
+            self.in_flight -= 1
+            self._slot_released.notify()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "degraded": self.degraded
+        }
+
+# Лимит на запросы пользователя, которые приводят к вызову LLM
+user_limiter = UserRateLimiter(
+    per_minute=config.RATE_LIMIT_PER_MINUTE,
+    burst=config.RATE_LIMIT_BURST,
+    max_users=config.USER_CACHE_SIZE
+)
@@ -0,0 +1,167 @@
+import copy
+import hashlib
+import json
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import LRUCache
+from config import config
+from models import RecipeCacheEntry, RecipeContent
+from recipe_store import content_to_recipe, store_recipe_content
+
+# Единицы измерения, которые не влияют на состав блюда
+_UNITS = {
+    "г", "гр", "грамм", "граммов", "кг", "мг", "мл", "л", "литр", "литра",
+    "шт", "шт.", "штук", "штуки", "штука", "ст.л.", "ч.л.", "ст.л", "ч.л",
+    "уп", "уп.", "упаковка", "упаковки", "пачка", "пачки", "банка", "банки",
+    "зубчик", "зубчика", "зубчиков", "пучок", "пучка", "стакан", "стакана"
+}
+_QUANTITY_RE = re.compile(r"^\d+(?:[.,/]\d+)?\D{0,6}$")
+
+def normalize_ingredient(ingredient: str) -> str:
+    """Приводит ингредиент к каноническому виду: нижний регистр, без количества и единиц"""
+    words = []
+    for token in ingredient.lower().replace("ё", "е").split():
+        token = token.strip(",;:-–—")
+        if not token or token in _UNITS or _QUANTITY_RE.match(token):
+            continue
+        words.append(token)
+    return " ".join(words)
+
+def ingredient_keys(ingredients: List[str]) -> List[str]:
+    """Ключи поиска из строк рецепта вида "куриное филе - 400 г" или запроса пользователя.
+    Продукты приводятся к ингредиентам локального каталога, поэтому "куриное филе"
+    находится по запросу "курица", а "помидоры черри" - по запросу "помидор" """
+    # recipe_engine сам импортирует этот модуль
+    from recipe_engine import recipe_engine
+    keys = (recipe_engine.search_key(ingredient.split(" - ")[0]) for ingredient in ingredients)
+    return sorted({key for key in keys if key})
+
+def make_recipe_key(ingredients: List[str], preferences: Dict[str, Any]) -> str:
+    """Строит ключ кэша по нормализованному набору ингредиентов и предпочтениям"""
+    payload = {
+        "ingredients": sorted({name for name in map(normalize_ingredient, ingredients) if name}),
+        "skill": (preferences.get("cooking_skill") or "новичок").lower(),
+        "diet": sorted(p.lower() for p in preferences.get("dietary_preferences") or []),
+        "allergies": sorted(a.lower() for a in preferences.get("allergies") or [])
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class RecipeCache:
+    """Кэш сгенерированных рецептов: локальный LRU и опциональный общий уровень в БД"""
+
+    def __init__(self, max_entries: int, ttl: int, max_variants: int, shared: bool, shared_max_rows: int):
+        self.local = LRUCache(max_entries, ttl)
+        self.ttl = ttl
+        self.max_variants = max(1, max_variants)
+        self.shared = shared
+        self.shared_max_rows = shared_max_rows
+        self.shared_hits = 0
+        self.refills = 0
+
+    def _wants_new_variant(self, count: int) -> bool:
+        # Пока вариантов меньше max_variants, часть запросов уходит в генерацию,
+        # чтобы пользователи видели разные рецепты для одного набора продуктов
+        return random.random() >= count / self.max_variants
+
+    async def get(self, key: str, db: Optional[AsyncSession] = None) -> Optional[Dict[str, Any]]:
+        variants = self.local.get(key)
+        if not variants and self.shared and db is not None:
+            variants = await self._load_shared(db, key)
+            if variants:
+                self.shared_hits += 1
+                self.local.set(key, variants)
+
+        if not variants:
+            return None
+
+        if self._wants_new_variant(len(variants)):
+            self.refills += 1
+            return None
+
+        return copy.deepcopy(random.choice(variants))
+
+    async def put(self, key: str, recipe: Dict[str, Any], db: Optional[AsyncSession] = None):
+        variants = list(self.local.peek(key) or [])
+        variants.append(copy.deepcopy(recipe))
+        self.local.set(key, variants[-self.max_variants:])
+
+        if self.shared and db is not None:
+            await self._store_shared(db, key, recipe)
+
+    async def _load_shared(self, db: AsyncSession, key: str) -> List[Dict[str, Any]]:
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+            result = await db.execute(
+                select(RecipeContent)
+                .join(RecipeCacheEntry, RecipeCacheEntry.content_id == RecipeContent.id)
+                .where(RecipeCacheEntry.cache_key == key, RecipeCacheEntry.created_at >= cutoff)
+                .order_by(RecipeCacheEntry.created_at.desc())
+                .limit(self.max_variants)
+            )
+            return [content_to_recipe(content) for content in result.scalars()]
+        except Exception as e:
+            print(f"❌ Ошибка чтения общего кэша рецептов: {e}")
+            return []
+
+    async def _store_shared(self, db: AsyncSession, key: str, recipe: Dict[str, Any]):
+        try:
+            # Текст рецепта хранится один раз в recipe_contents вместе с историей пользователей,
+            # в кэше только ссылка на него
+            content_id = await store_recipe_content(db, recipe, ingredient_keys(recipe["ingredients"]))
+            db.add(RecipeCacheEntry(cache_key=key, content_id=content_id))
+            await db.flush()
+
+            # Оставляем только последние max_variants вариантов для ключа
+            keep_ids = (
+                select(RecipeCacheEntry.id)
+                .where(RecipeCacheEntry.cache_key == key)
+                .order_by(RecipeCacheEntry.id.desc())
+                .limit(self.max_variants)
+            )
+            await db.execute(
+                delete(RecipeCacheEntry).where(
+                    RecipeCacheEntry.cache_key == key,
+                    RecipeCacheEntry.id.not_in(keep_ids)
+                )
+            )
+
+            # Вытесняем устаревшие записи и ограничиваем общий размер таблицы
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+            await db.execute(delete(RecipeCacheEntry).where(RecipeCacheEntry.created_at < cutoff))
+            boundary = (
+                select(RecipeCacheEntry.id)
+                .order_by(RecipeCacheEntry.id.desc())
+                .offset(self.shared_max_rows)
+                .limit(1)
+                .scalar_subquery()
+            )
+            await db.execute(delete(RecipeCacheEntry).where(RecipeCacheEntry.id <= boundary))
+            await db.commit()
+        except Exception as e:
+            print(f"❌ Ошибка записи в общий кэш рецептов: {e}")
+            await db.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats.update({
+            "max_variants": self.max_variants,
+            "shared": self.shared,
+            "shared_hits": self.shared_hits,
+            "refills": self.refills
+        })
+        return stats
+
+recipe_cache = RecipeCache(
+    max_entries=config.RECIPE_CACHE_SIZE,
+    ttl=config.RECIPE_CACHE_TTL,
+    max_variants=config.RECIPE_CACHE_VARIANTS,
+    shared=config.RECIPE_CACHE_SHARED,
+    shared_max_rows=config.RECIPE_CACHE_SHARED_MAX_ROWS
+)
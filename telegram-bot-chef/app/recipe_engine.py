@@ -0,0 +1,164 @@
+import copy
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from cache import LRUCache
+from config import config
+from recipe_cache import normalize_ingredient
+
+# Окончания, которые отбрасываются, чтобы "помидоры" и "помидор" дали одну основу
+_ENDING_RE = re.compile(
+    r"(иями|ями|ами|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие|ов|ев|ам|ям|ах|ях|ом|ем|а|я|о|е|ы|и|у|ю|ь|й)$"
+)
+
+def _stem(word: str) -> str:
+    return _ENDING_RE.sub("", word) if len(word) > 3 else word
+
+def _stem_phrase(phrase: str) -> str:
+    return " ".join(_stem(word) for word in phrase.split())
+
+class RecipeEngine:
+    """Локальный каталог рецептов с инвертированным индексом
+    "канонический ингредиент -> рецепты, в которых он нужен"."""
+
+    def __init__(self, recipes: List[Dict[str, Any]], aliases: Dict[str, str], pantry: Iterable[str],
+                 diets: Optional[Dict[str, List[str]]] = None):
+        self.pantry: Set[str] = {normalize_ingredient(name) for name in pantry}
+        # Часть названия диеты ("вегетариан") -> ингредиенты каталога, которые она исключает
+        self.diets: Dict[str, frozenset] = {
+            normalize_ingredient(marker): frozenset(map(normalize_ingredient, keys))
+            for marker, keys in (diets or {}).items()
+        }
+        self._recipes: Dict[int, Dict[str, Any]] = {}
+        self._required: Dict[int, frozenset] = {}
+        self._index: Dict[str, List[int]] = {}
+        self._lookup: Dict[str, str] = {}
+        self._resolved = LRUCache(max_entries=50000, ttl=float("inf"))
+        self.lookups = 0
+        self.matches = 0
+        self.total_ms = 0.0
+
+        for position, recipe in enumerate(recipes):
+            recipe_id = recipe.get("id", position)
+            required = frozenset(
+                key for key in map(normalize_ingredient, recipe["keys"]) if key and key not in self.pantry
+            )
+            if not required:
+                continue
+            self._recipes[recipe_id] = {field: recipe[field] for field in
+                                        ("title", "ingredients", "instructions", "cooking_time", "difficulty")}
+            self._required[recipe_id] = required
+            for key in required:
+                self._index.setdefault(key, []).append(recipe_id)
+                self._add_lookup(key, key)
+
+        for alias, canonical in aliases.items():
+            self._add_lookup(normalize_ingredient(alias), normalize_ingredient(canonical))
+
+    def _add_lookup(self, name: str, canonical: str):
+        self._lookup.setdefault(name, canonical)
+        self._lookup.setdefault(_stem_phrase(name), canonical)
+
+    @classmethod
+    def load(cls, path: str) -> "RecipeEngine":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            engine = cls(data.get("recipes", []), data.get("aliases", {}), data.get("pantry", []), data.get("diets", {}))
+            print(f"✅ Загружено локальных рецептов: {len(engine)}")
+            return engine
+        except Exception as e:
+            print(f"❌ Не удалось загрузить локальные рецепты из {path}: {e}")
+            return cls([], {}, [])
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def canonical(self, ingredient: str) -> Optional[str]:
+        """Канонический ингредиент каталога для продукта пользователя или None, если он неизвестен.
+        Сначала ищется фраза целиком, затем отдельные слова ("помидоры черри" -> "помидоры")"""
+        cached = self._resolved.peek(ingredient)
+        if cached is not None:
+            return cached or None
+
+        name = normalize_ingredient(ingredient)
+        canonical = self._lookup.get(name) or self._lookup.get(_stem_phrase(name))
+        if canonical is None:
+            for word in name.split():
+                canonical = self._lookup.get(word) or self._lookup.get(_stem(word))
+                if canonical:
+                    break
+
+        # Пустая строка в кэше - продукт не найден в каталоге
+        self._resolved.set(ingredient, canonical or "")
+        return canonical
+
+    def search_key(self, ingredient: str) -> str:
+        """Ключ продукта для поиска по сохраненным рецептам: ингредиент каталога, а для
+        неизвестного каталогу продукта - основа его названия ("сыра" и "сыр" дают один ключ)"""
+        return self.canonical(ingredient) or _stem_phrase(normalize_ingredient(ingredient))
+
+    def _excluded(self, preferences: Dict[str, Any]) -> Set[str]:
+        """Ингредиенты каталога, которые исключают аллергии и диеты пользователя"""
+        excluded = {key for key in map(self.canonical, preferences.get("allergies") or []) if key}
+        for diet in map(normalize_ingredient, preferences.get("dietary_preferences") or []):
+            for marker, keys in self.diets.items():
+                if marker in diet:
+                    excluded |= keys
+        return excluded
+
+    def find(self, ingredients: List[str], preferences: Optional[Dict[str, Any]] = None,
+             min_coverage: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Подбирает рецепт, для которого в холодильнике есть не меньше min_coverage
+        нужных ингредиентов. Из равных по покрытию кандидатов выбирается случайный.
+        Если покрытие неполное, недостающие продукты перечислены в поле missing"""
+        started_at = time.perf_counter()
+        self.lookups += 1
+
+        available = {key for key in map(self.canonical, ingredients) if key}
+        excluded = self._excluded(preferences or {})
+
+        # Считаем совпадения только по рецептам, где встречается хотя бы один из продуктов
+        matched = Counter()
+        for key in available:
+            matched.update(self._index.get(key, ()))
+
+        best_score = None
+        candidates = []
+        for recipe_id, count in matched.items():
+            required = self._required[recipe_id]
+            coverage = count / len(required)
+            if coverage < min_coverage or required & excluded:
+                continue
+            score = (coverage, count)
+            if best_score is None or score > best_score:
+                best_score = score
+                candidates = [recipe_id]
+            elif score == best_score:
+                candidates.append(recipe_id)
+
+        self.total_ms += (time.perf_counter() - started_at) * 1000
+        if not candidates:
+            return None
+        self.matches += 1
+        recipe_id = random.choice(candidates)
+        recipe = copy.deepcopy(self._recipes[recipe_id])
+        missing = self._required[recipe_id] - available
+        if missing:
+            recipe["missing"] = sorted(missing)
+        return recipe
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recipes": len(self._recipes),
+            "ingredients": len(self._index),
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "avg_lookup_ms": round(self.total_ms / self.lookups, 3) if self.lookups else 0.0
+        }
+
+recipe_engine = RecipeEngine.load(config.LOCAL_RECIPES_PATH)
@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Recipe, RecipeContent
+from recipe_cache import ingredient_keys
+from recipe_store import content_to_recipe
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# В списке только легкие колонки; ингредиенты и шаги читаются по запросу конкретного рецепта
+_SUMMARY_COLUMNS = (
+    Recipe.id, RecipeContent.title, RecipeContent.cooking_time, RecipeContent.difficulty, Recipe.created_at
+)
+
+def _summaries(user_id: int):
+    return (
+        select(*_SUMMARY_COLUMNS)
+        .join(RecipeContent, Recipe.content_id == RecipeContent.id)
+        .where(Recipe.user_id == user_id)
+    )
+
+@dataclass
+class RecipePage:
+    items: List[Dict[str, Any]]
+    # Курсор для более старых рецептов (следующая страница) и для более новых (предыдущая)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+def encode_cursor(created_at: datetime, recipe_id: int) -> str:
+    """Курсор (created_at, id) в компактном виде - помещается в callback_data Telegram"""
+    # Целочисленная арифметика: через float микросекунды теряются и курсор сдвигается
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    return f"{micros:x}.{recipe_id:x}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбирает курсор; для некорректного значения выбрасывает ValueError"""
+    micros, recipe_id = cursor.split(".")
+    return _EPOCH + int(micros, 16) * _MICROSECOND, int(recipe_id, 16)
+
+def _cursor(item: Dict[str, Any]) -> str:
+    return encode_cursor(item["created_at"], item["id"])
+
+async def list_recipes(session: AsyncSession, user_id: int, limit: int,
+                       after: Optional[str] = None, before: Optional[str] = None) -> RecipePage:
+    """Страница истории рецептов от новых к старым, с позиции курсора.
+    after - рецепты старше курсора, before - новее. Запрос идет по индексу
+    (user_id, created_at DESC, id DESC), поэтому его цена не зависит от длины истории"""
+    key = tuple_(Recipe.created_at, Recipe.id)
+    stmt = _summaries(user_id)
+    if before:
+        stmt = stmt.where(key > tuple_(*decode_cursor(before))).order_by(Recipe.created_at, Recipe.id)
+    else:
+        if after:
+            stmt = stmt.where(key < tuple_(*decode_cursor(after)))
+        stmt = stmt.order_by(Recipe.created_at.desc(), Recipe.id.desc())
+
+    result = await session.execute(stmt.limit(limit + 1))
+    items = [dict(row._mapping) for row in result]
+    has_more = len(items) > limit
+    items = items[:limit]
+    if before:
+        items.reverse()
+
+    page = RecipePage(items=items)
+    if items:
+        # В сторону, откуда пришли, рецепты точно есть; в другую - только если выбрали лишнюю строку
+        older = has_more if not before else True
+        newer = has_more if before else bool(after)
+        page.next_cursor = _cursor(items[-1]) if older else None
+        page.prev_cursor = _cursor(items[0]) if newer else None
+    return page
+
+@dataclass
+class SearchPage:
+    items: List[Dict[str, Any]]
+    next_offset: Optional[int] = None
+
+async def search_recipes(session: AsyncSession, user_id: int, query: Optional[str] = None,
+                         ingredients: Optional[List[str]] = None, limit: int = 10, offset: int = 0) -> SearchPage:
+    """Поиск по рецептам пользователя: полнотекстовый по названию, ингредиентам и шагам
+    (websearch-синтаксис, морфология русского) и/или по наличию всех указанных продуктов.
+    Результаты упорядочены по релевантности, затем от новых к старым"""
+    stmt = _summaries(user_id)
+    order_by = [Recipe.created_at.desc(), Recipe.id.desc()]
+
+    if query:
+        ts_query = func.websearch_to_tsquery(cast("russian", REGCONFIG), query)
+        rank = func.ts_rank_cd(RecipeContent.search_vector, ts_query)
+        stmt = stmt.add_columns(rank.label("rank")).where(RecipeContent.search_vector.op("@@")(ts_query))
+        order_by.insert(0, rank.desc())
+
+    keys = ingredient_keys(ingredients or [])
+    if keys:
+        stmt = stmt.where(RecipeContent.ingredient_keys.contains(keys))
+
+    result = await session.execute(stmt.order_by(*order_by).offset(offset).limit(limit + 1))
+    items = [dict(row._mapping) for row in result]
+    has_more = len(items) > limit
+    return SearchPage(items=items[:limit], next_offset=offset + limit if has_more else None)
+
+async def latest_recipe(session: AsyncSession, user_id: int) -> Optional[Tuple[int, datetime]]:
+    """(id, created_at) последнего рецепта - версия истории: рецепты только добавляются,
+    поэтому любое изменение списка меняет это значение. Одно чтение из начала индекса"""
+    result = await session.execute(
+        select(Recipe.id, Recipe.created_at)
+        .where(Recipe.user_id == user_id)
+        .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+        .limit(1)
+    )
+    row = result.first()
+    return (row.id, row.created_at) if row else None
+
+async def recipe_created_at(session: AsyncSession, user_id: int, recipe_id: int) -> Optional[datetime]:
+    """Время создания рецепта без чтения его текста - для условных запросов"""
+    result = await session.execute(
+        select(Recipe.created_at).where(Recipe.id == recipe_id, Recipe.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+async def get_recipe(session: AsyncSession, user_id: int, recipe_id: int) -> Optional[Dict[str, Any]]:
+    """Полный рецепт пользователя в том же формате, что и сгенерированный"""
+    result = await session.execute(
+        select(Recipe.id, Recipe.created_at, RecipeContent)
+        .join(RecipeContent, Recipe.content_id == RecipeContent.id)
+        .where(Recipe.id == recipe_id, Recipe.user_id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    recipe = content_to_recipe(row.RecipeContent)
+    recipe.update({"id": row.id, "created_at": row.created_at})
+    return recipe
\ No newline at end of file
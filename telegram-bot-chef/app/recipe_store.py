@@ -0,0 +1,87 @@
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from sqlalchemy import BigInteger, insert, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Recipe, RecipeContent
+
+def _normalize_text(value: Any) -> str:
+    return " ".join(str(value or "").lower().replace("ё", "е").split())
+
+def content_hash(recipe: Dict[str, Any]) -> str:
+    """Хэш содержимого рецепта без учета регистра и пробелов.
+    Используется и миграцией 0006 - при изменении нормализации старые рецепты перестанут совпадать"""
+    payload = {
+        "title": _normalize_text(recipe.get("title")),
+        "ingredients": [_normalize_text(item) for item in recipe.get("ingredients") or []],
+        "instructions": [_normalize_text(step) for step in recipe.get("instructions") or [] if step.strip()],
+        "cooking_time": recipe.get("cooking_time"),
+        "difficulty": _normalize_text(recipe.get("difficulty"))
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _insert_content(recipe: Dict[str, Any], ingredient_keys: List[str], digest: str):
+    # DO NOTHING не переписывает уже сохраненный рецепт и не пересчитывает его search_vector;
+    # id существующей строки выбирается отдельно
+    return pg_insert(RecipeContent).values(
+        content_hash=digest,
+        title=recipe["title"],
+        ingredients=recipe["ingredients"],
+        ingredient_keys=ingredient_keys,
+        instructions="\n".join(recipe["instructions"]),
+        cooking_time=recipe["cooking_time"],
+        difficulty=recipe["difficulty"]
+    ).on_conflict_do_nothing(index_elements=[RecipeContent.content_hash]).returning(RecipeContent.id)
+
+async def store_recipe_content(session: AsyncSession, recipe: Dict[str, Any], ingredient_keys: List[str]) -> int:
+    """Сохраняет текст рецепта, если такого еще нет, и возвращает его id. Коммит остается за вызывающим"""
+    digest = content_hash(recipe)
+    content_id = (await session.execute(_insert_content(recipe, ingredient_keys, digest))).scalar()
+    if content_id is None:
+        content_id = await session.scalar(select(RecipeContent.id).where(RecipeContent.content_hash == digest))
+    return content_id
+
+async def save_user_recipe(session: AsyncSession, user_id: int, recipe: Dict[str, Any],
+                           ingredient_keys: List[str]) -> int:
+    """Добавляет рецепт в историю пользователя одним запросом:
+    WITH inserted AS (INSERT ... ON CONFLICT DO NOTHING RETURNING id),
+    content AS (id из inserted или уже сохраненного текста) INSERT INTO recipes ... RETURNING id.
+    Коммит остается за вызывающим"""
+    digest = content_hash(recipe)
+    inserted = _insert_content(recipe, ingredient_keys, digest).cte("inserted")
+    content = (
+        union_all(
+            select(inserted.c.id),
+            select(RecipeContent.id).where(RecipeContent.content_hash == digest)
+        )
+        .limit(1)
+        .cte("content")
+    )
+    stmt = (
+        insert(Recipe)
+        .from_select(["user_id", "content_id"], select(literal(user_id, BigInteger), content.c.id))
+        .add_cte(inserted)
+        .add_cte(content)
+        .returning(Recipe.id)
+    )
+    # Если такой же текст параллельно сохранила другая транзакция, снимок запроса может
+    # его не видеть и ничего не вставить; повтор уже увидит закоммиченную строку
+    for _ in range(2):
+        recipe_id = (await session.execute(stmt)).scalar()
+        if recipe_id is not None:
+            return recipe_id
+    raise RuntimeError(f"Не удалось сохранить рецепт {digest}")
+
+def content_to_recipe(content: RecipeContent) -> Dict[str, Any]:
+    """Рецепт в формате, который используют бот и кэш"""
+    return {
+        "title": content.title,
+        "ingredients": content.ingredients or [],
+        "instructions": (content.instructions or "").splitlines(),
+        "cooking_time": content.cooking_time,
+        "difficulty": content.difficulty
+    }
\ No newline at end of file
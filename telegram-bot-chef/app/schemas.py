@@ -0,0 +1,117 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+DIFFICULTIES = ("легко", "средне", "сложно")
+
+class RecipeIngredient(BaseModel):
+    name: str = Field(min_length=1)
+    quantity: str = "по вкусу"
+
+class RecipeSchema(BaseModel):
+    """Рецепт в структурированном ответе GigaChat"""
+    title: str = Field(min_length=1)
+    ingredients: List[RecipeIngredient] = Field(min_length=1)
+    steps: List[str] = Field(min_length=1)
+    cooking_time: int = Field(ge=1, le=24 * 60)
+    difficulty: str
+
+    @field_validator("cooking_time", mode="before")
+    @classmethod
+    def _minutes(cls, value: Any) -> Any:
+        # Модель иногда пишет "30 минут" вместо числа
+        if isinstance(value, str):
+            match = re.search(r"\d+", value)
+            return int(match.group()) if match else value
+        return value
+
+    @field_validator("difficulty")
+    @classmethod
+    def _difficulty(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in DIFFICULTIES:
+            raise ValueError(f"должно быть одно из: {', '.join(DIFFICULTIES)}")
+        return value
+
+    def to_recipe(self) -> Dict[str, Any]:
+        """Приводит ответ к формату рецепта, который используют бот и кэш"""
+        return {
+            "title": self.title.strip(),
+            "ingredients": [f"{item.name.strip()} - {item.quantity.strip() or 'по вкусу'}" for item in self.ingredients],
+            "instructions": [
+                step if re.match(r"^\d+[.)]", step) else f"{number}. {step}"
+                for number, step in enumerate((step.strip() for step in self.steps), start=1)
+            ],
+            "cooking_time": self.cooking_time,
+            "difficulty": self.difficulty
+        }
+
+class RecipeBatchSchema(BaseModel):
+    """Несколько рецептов, сгенерированных одним запросом"""
+    recipes: List[RecipeSchema] = Field(min_length=1)
+
+def _extract_object(text: str) -> str:
+    # Ограждение ```json и текст вокруг объекта отбрасываются
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    return text
+
+def parse_recipe_json(text: str) -> RecipeSchema:
+    """Декодирует и проверяет ответ одним вызовом.
+    Ошибки формата и схемы выбрасываются как ValidationError"""
+    return RecipeSchema.model_validate_json(_extract_object(text))
+
+def parse_recipe_batch(text: str) -> List[RecipeSchema]:
+    """Декодирует ответ со списком рецептов; повторы одного блюда отбрасываются"""
+    recipes = {}
+    for recipe in RecipeBatchSchema.model_validate_json(_extract_object(text)).recipes:
+        recipes.setdefault(recipe.title.strip().lower(), recipe)
+    return list(recipes.values())
+
+
+# Ответы HTTP API
+
+class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    telegram_id: int
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    dietary_preferences: List[str] = []
+    allergies: List[str] = []
+    cooking_skill: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @field_validator("dietary_preferences", "allergies", mode="before")
+    @classmethod
+    def _empty_list(cls, value: Any) -> Any:
+        return value or []
+
+class RecipeSummaryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str] = None
+    cooking_time: Optional[int] = None
+    difficulty: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class RecipePageOut(BaseModel):
+    items: List[RecipeSummaryOut]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class RecipeOut(RecipeSummaryOut):
+    ingredients: List[str] = []
+    instructions: List[str] = []
+
+class RecipeSearchItemOut(RecipeSummaryOut):
+    rank: Optional[float] = None
+
+class RecipeSearchOut(BaseModel):
+    items: List[RecipeSearchItemOut]
+    next_offset: Optional[int] = None
\ No newline at end of file
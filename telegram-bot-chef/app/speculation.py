@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Dict, Set
+
+from agent import chef_agent
+from config import config
+from database import AsyncSessionLocal
+from gigachat_client import gigachat_client
+
+class SpeculativeGenerator:
+    """Фоновая генерация рецепта сразу после изменения холодильника.
+    Серия добавлений откладывает запуск (debounce), новое изменение отменяет ожидающую задачу.
+    Запускается, только если у GigaChat есть свободный бюджет, и не больше max_concurrent одновременно"""
+
+    def __init__(self, delay: float, max_concurrent: int):
+        self.delay = delay
+        self.max_concurrent = max_concurrent
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._generating: Set[int] = set()
+        self.scheduled = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.joined = 0
+
+    def schedule(self, user_id: int):
+        """Планирует генерацию для пользователя, отменяя предыдущую"""
+        self._cancel(user_id)
+        self._tasks[user_id] = asyncio.create_task(self._run(user_id))
+        self.scheduled += 1
+
+    def _cancel(self, user_id: int):
+        task = self._tasks.pop(user_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.cancelled += 1
+
+    def _has_budget(self) -> bool:
+        # Спекулятивные запросы не должны занимать место реальных
+        if len(self._generating) >= self.max_concurrent:
+            return False
+        return gigachat_client.admission.has_capacity() and not gigachat_client.breaker.is_open
+
+    async def join(self, user_id: int):
+        """Вызывается перед реальным запросом пользователя: уже идущую генерацию дожидаемся,
+        чтобы забрать ее результат, а ожидающую запуска отменяем"""
+        task = self._tasks.get(user_id)
+        if task is None:
+            return
+        if user_id in self._generating:
+            self.joined += 1
+            # wait, а не await: отмена ожидающего не прерывает саму генерацию
+            await asyncio.wait([task])
+        else:
+            self._cancel(user_id)
+
+    async def _run(self, user_id: int):
+        try:
+            await asyncio.sleep(self.delay)
+            if not self._has_budget():
+                self.skipped += 1
+                print(f"⚠️ Нет свободного бюджета, пропускаем заблаговременный рецепт для {user_id}")
+                return
+            
+            self._generating.add(user_id)
+            try:
+                async with AsyncSessionLocal() as session:
+                    if await chef_agent.prepare_suggestion(session, user_id):
+                        self.completed += 1
+                        print(f"✅ Заблаговременный рецепт для {user_id} готов")
+            finally:
+                self._generating.discard(user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ Ошибка заблаговременной генерации рецепта: {e}")
+        finally:
+            if self._tasks.get(user_id) is asyncio.current_task():
+                del self._tasks[user_id]
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._tasks) - len(self._generating),
+            "generating": len(self._generating),
+            "max_concurrent": self.max_concurrent,
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "joined": self.joined
+        }
+
+speculator = SpeculativeGenerator(config.SPECULATION_DELAY, config.SPECULATION_MAX_CONCURRENT)
\ No newline at end of file
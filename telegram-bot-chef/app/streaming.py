@@ -0,0 +1,94 @@
+import asyncio
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+# Telegram не принимает сообщения длиннее 4096 символов
+MAX_MESSAGE_LENGTH = 4096
+
+# Заголовки секций рецепта в ответе GigaChat
+_SECTION_MARKERS = ("ингредиенты", "приготовление", "время приготовления", "сложность")
+
+def _completed_sections(text: str) -> int:
+    """Считает завершенные секции рецепта: название, ингредиенты, шаги, итоги"""
+    lines = [line.strip().lower() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return 0
+    return 1 + sum(1 for marker in _SECTION_MARKERS if any(marker in line for line in lines))
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[:MAX_MESSAGE_LENGTH - 1] + "…"
+
+class ProgressiveMessage:
+    """Сообщение-заглушка, которое постепенно заполняется текстом рецепта.
+
+    Правки ограничены по частоте: при появлении новой секции не чаще
+    min_interval, без новой секции - не чаще 2 * min_interval. Во время
+    RetryAfter от Telegram промежуточные правки пропускаются."""
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, min_interval: float):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self._shown = ""
+        self._sections = 0
+        self._last_edit = 0.0
+        self._blocked_until = 0.0
+        self.edits = 0
+
+    async def update(self, text: str):
+        # Показываем только завершенные строки, чтобы не мигали обрывки слов
+        complete = text[:text.rfind("\n") + 1].strip()
+        if not complete or complete == self._shown:
+            return
+
+        now = asyncio.get_running_loop().time()
+        if now < self._blocked_until:
+            return
+
+        sections = _completed_sections(complete)
+        interval = self.min_interval if sections > self._sections else self.min_interval * 2
+        if now - self._last_edit < interval:
+            return
+
+        self._sections = sections
+        await self._edit(complete + "\n\n⏳ Пишу рецепт...")
+        self._shown = complete
+
+    async def finish(self, text: str, parse_mode: Optional[str] = None):
+        """Заменяет заглушку итоговым текстом; при ошибке разметки отправляет его без форматирования"""
+        delay = self._blocked_until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            await self.bot.edit_message_text(
+                _truncate(text), chat_id=self.chat_id, message_id=self.message_id, parse_mode=parse_mode
+            )
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self.bot.edit_message_text(
+                _truncate(text), chat_id=self.chat_id, message_id=self.message_id, parse_mode=parse_mode
+            )
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return
+            print(f"⚠️ Не удалось отформатировать итоговое сообщение: {e}")
+            await self.bot.edit_message_text(_truncate(text), chat_id=self.chat_id, message_id=self.message_id)
+
+    async def _edit(self, text: str):
+        loop = asyncio.get_running_loop()
+        self._last_edit = loop.time()
+        try:
+            await self.bot.edit_message_text(_truncate(text), chat_id=self.chat_id, message_id=self.message_id)
+            self.edits += 1
+        except TelegramRetryAfter as e:
+            print(f"⚠️ Telegram ограничил частоту правок на {e.retry_after} с")
+            self._blocked_until = loop.time() + e.retry_after
+        except TelegramBadRequest as e:
+            if "not modified" not in str(e):
+                print(f"⚠️ Ошибка обновления сообщения: {e}")
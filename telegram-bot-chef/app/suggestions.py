@@ -0,0 +1,68 @@
+import copy
+import hashlib
+import json
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from cache import LRUCache
+from config import config
+
+def fridge_fingerprint(canonical_names: Iterable[str], preferences: Dict[str, Any]) -> str:
+    """Отпечаток холодильника и предпочтений: отложенные рецепты годятся, пока он не изменился"""
+    payload = {
+        "ingredients": sorted(set(canonical_names)),
+        "skill": preferences.get("cooking_skill") or "новичок",
+        "diet": sorted(preferences.get("dietary_preferences") or []),
+        "allergies": sorted(preferences.get("allergies") or [])
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SuggestionBuffer:
+    """Рецепты, отложенные пользователю на следующие нажатия "Создать рецепт".
+    Буфер привязан к отпечатку холодильника и сбрасывается, когда продукты или предпочтения меняются"""
+
+    def __init__(self, max_entries: int, ttl: int, max_per_user: int = 10):
+        self.buffers = LRUCache(max_entries, ttl)
+        self.max_per_user = max_per_user
+        self.stored = 0
+        self.served = 0
+
+    def push(self, user_id: int, fingerprint: str, recipes: List[Dict[str, Any]]):
+        if not recipes:
+            return
+        entry = self.buffers.peek(user_id)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, deque(maxlen=self.max_per_user))
+        entry[1].extend(copy.deepcopy(recipe) for recipe in recipes)
+        self.buffers.set(user_id, entry)
+        self.stored += len(recipes)
+
+    def pop(self, user_id: int, fingerprint: str) -> Optional[Dict[str, Any]]:
+        entry = self.buffers.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] != fingerprint:
+            # Холодильник изменился - отложенные рецепты больше не подходят
+            self.buffers.invalidate(user_id)
+            return None
+        recipe = entry[1].popleft() if entry[1] else None
+        if not entry[1]:
+            self.buffers.invalidate(user_id)
+        if recipe is not None:
+            self.served += 1
+        return recipe
+
+    def pending(self, user_id: int, fingerprint: str) -> int:
+        entry = self.buffers.peek(user_id)
+        return len(entry[1]) if entry is not None and entry[0] == fingerprint else 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.buffers.stats()
+        stats.update({
+            "stored": self.stored,
+            "served": self.served
+        })
+        return stats
+
+suggestion_buffer = SuggestionBuffer(config.SUGGESTION_BUFFER_SIZE, config.SUGGESTION_TTL)
\ No newline at end of file
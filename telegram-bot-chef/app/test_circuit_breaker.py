@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+def _breaker(open_seconds: float = 0.05) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test", window=10, min_calls=4, error_rate=0.5, open_seconds=open_seconds,
+        min_timeout=1.0, max_timeout=30.0, timeout_factor=2.0
+    )
+
+def _trip(breaker: CircuitBreaker) -> int:
+    """Проваливает вызовы, пока цепь не разомкнется; возвращает число вызовов"""
+    calls = 0
+    while breaker.state != OPEN:
+        assert breaker.allow_request()
+        breaker.record_failure()
+        calls += 1
+    return calls
+
+def test_open_and_half_open_probe():
+    print(" Тестируем размыкание цепи и пробный вызов...")
+
+    breaker = _breaker()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CLOSED, "до min_calls вызовов цепь не размыкается"
+
+    breaker = _breaker()
+    assert _trip(breaker) == 4
+    assert breaker.is_open and breaker.opened == 1
+    assert not breaker.allow_request() and breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.allow_request(), "после open_seconds пропускается пробный вызов"
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request(), "пока проба не завершилась, остальные отклоняются"
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED and breaker.failure_rate() == 0
+    assert breaker.allow_request()
+
+    _trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.is_open and breaker.opened == 3
+    print("✅ Цепь размыкается по доле ошибок и замыкается только успешной пробой")
+
+def test_late_success_does_not_close():
+    print(" Тестируем успех запроса, начатого до размыкания...")
+
+    breaker = _breaker(open_seconds=60)
+    _trip(breaker)
+    breaker.record_success(0.1)
+    assert breaker.state == OPEN and breaker.is_open
+    print("✅ Без пробы цепь остается разомкнутой")
+
+async def _run_guarded(breaker: CircuitBreaker):
+    async with breaker.guard():
+        pass
+
+async def _cancelled_probe(breaker: CircuitBreaker):
+    async def call():
+        async with breaker.guard():
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(call())
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+def test_guard():
+    print(" Тестируем guard...")
+
+    breaker = _breaker(open_seconds=60)
+    _trip(breaker)
+    try:
+        asyncio.run(_run_guarded(breaker))
+        assert False, "разомкнутая цепь должна отклонить вызов"
+    except CircuitOpenError:
+        pass
+
+    breaker = _breaker()
+    _trip(breaker)
+    time.sleep(0.06)
+    asyncio.run(_cancelled_probe(breaker))
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request(), "отмененная нами проба не блокирует следующую"
+    print("✅ Отмененный вызов не считается ошибкой и освобождает пробу")
+
+def test_adaptive_timeout():
+    print(" Тестируем таймаут по p95...")
+
+    breaker = _breaker()
+    for latency in (0.5, 0.5, 0.5):
+        breaker.record_success(latency)
+    assert breaker.timeout() == 30.0, "пока задержек мало, действует максимальный таймаут"
+
+    for latency in [1.0] * 16 + [4.0] * 4:
+        breaker.record_success(latency)
+    # В окне 10 последних задержек: шесть по 1 с и четыре по 4 с, p95 = 4 с
+    assert breaker.latency_percentile(0.95) == 4.0
+    assert breaker.timeout() == 8.0
+
+    for latency in [0.1] * 10:
+        breaker.record_success(latency)
+    assert breaker.timeout() == 1.0, "таймаут не опускается ниже min_timeout"
+
+    for latency in [20.0] * 10:
+        breaker.record_success(latency)
+    assert breaker.timeout() == 30.0, "таймаут не поднимается выше max_timeout"
+    print("✅ Таймаут следует за p95 в пределах [min_timeout, max_timeout]")
+
+if __name__ == "__main__":
+    test_open_and_half_open_probe()
+    test_late_success_does_not_close()
+    test_guard()
+    test_adaptive_timeout()
@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from config import config
+
+# Очередь в памяти к базе не обращается, но database создает движок при импорте.
+# config мог уже загрузиться в другом тесте, поэтому адрес задается в нем, а не в окружении
+config.DATABASE_URL = config.DATABASE_URL or "postgresql+asyncpg://localhost/test"
+
+from job_queue import DUPLICATE, FULL, QUEUED, MemoryJobBackend, RecipeJobQueue
+
+async def _dedup_and_capacity():
+    queue = RecipeJobQueue(MemoryJobBackend(max_size=2), workers=1, heartbeat_interval=60)
+    assert await queue.enqueue(1, 10, 100) == QUEUED
+    assert await queue.enqueue(1, 10, 101) == DUPLICATE, "у пользователя одна активная задача"
+    assert await queue.enqueue(2, 20, 200) == QUEUED
+    assert await queue.enqueue(3, 30, 300) == FULL
+    stats = await queue.stats()
+    assert (stats["depth"], stats["enqueued"], stats["deduplicated"], stats["rejected"]) == (2, 2, 1, 1)
+
+    handled = []
+    async def handler(job):
+        handled.append(job.user_id)
+
+    await queue.start(handler)
+    while len(handled) < 2:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert handled == [1, 2]
+    # Выполненная задача больше не блокирует новую того же пользователя
+    assert await queue.enqueue(1, 10, 102) == QUEUED
+
+async def _requeue_on_stop():
+    backend = MemoryJobBackend(max_size=10)
+    queue = RecipeJobQueue(backend, workers=1, heartbeat_interval=60)
+    started = asyncio.Event()
+    async def stuck(job):
+        started.set()
+        await asyncio.sleep(60)
+
+    await queue.enqueue(1, 10, 100)
+    await queue.start(stuck)
+    await started.wait()
+    await queue.stop()
+    assert await backend.depth() == 1, "прерванная задача возвращается в очередь"
+    assert await queue.enqueue(1, 10, 101) == DUPLICATE, "и остается активной задачей пользователя"
+
+    handled = []
+    async def handler(job):
+        handled.append(job.message_id)
+
+    restarted = RecipeJobQueue(backend, workers=1, heartbeat_interval=60)
+    await restarted.start(handler)
+    while not handled:
+        await asyncio.sleep(0.01)
+    await restarted.stop()
+    assert handled == [100] and await backend.depth() == 0
+    stats = await restarted.stats()
+    assert stats["completed"] == 1 and stats["running"] == 0
+
+async def _failed_job_is_done():
+    queue = RecipeJobQueue(MemoryJobBackend(max_size=10), workers=1, heartbeat_interval=60)
+    async def broken(job):
+        raise RuntimeError("GigaChat недоступен")
+
+    await queue.enqueue(1, 10, 100)
+    await queue.start(broken)
+    while not queue.failed:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert await queue.backend.depth() == 0
+    assert await queue.enqueue(1, 10, 101) == QUEUED
+
+async def _heartbeat():
+    touched = []
+    class TouchingBackend(MemoryJobBackend):
+        async def touch(self, job):
+            touched.append(job.user_id)
+
+    queue = RecipeJobQueue(TouchingBackend(max_size=10), workers=1, heartbeat_interval=0.01)
+    async def slow(job):
+        await asyncio.sleep(0.05)
+
+    await queue.enqueue(1, 10, 100)
+    await queue.start(slow)
+    while not queue.completed:
+        await asyncio.sleep(0.01)
+    count = len(touched)
+    await asyncio.sleep(0.03)
+    await queue.stop()
+    assert count >= 2, "аренда продлевается, пока задача выполняется"
+    assert len(touched) == count, "после завершения задачи продление прекращается"
+
+def test_memory_queue_dedup():
+    print(" Тестируем очередь генерации в памяти...")
+    asyncio.run(_dedup_and_capacity())
+    asyncio.run(_failed_job_is_done())
+    print("✅ Одна активная задача на пользователя, переполнение отклоняется")
+
+def test_requeue_on_stop():
+    print(" Тестируем возврат задачи при остановке...")
+    asyncio.run(_requeue_on_stop())
+    asyncio.run(_heartbeat())
+    print("✅ Прерванная задача доделывается после перезапуска, аренда продлевается")
+
+if __name__ == "__main__":
+    test_memory_queue_dedup()
+    test_requeue_on_stop()
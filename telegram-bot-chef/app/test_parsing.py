@@ -0,0 +1,78 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from categorizer import categorizer
+from fridge_import import parse_shopping_list
+from ingredient_parser import parse_ingredient
+
+def test_decimal_quantities():
+    print(" Тестируем дробные количества в списке покупок...")
+
+    cases = {
+        "1.5 л молока": ("молока", 1500.0, "мл"),
+        "0.5 кг фарша": ("фарша", 500.0, "г"),
+        "1. молоко 2 л": ("молоко", 2000.0, "мл"),
+        "2) яйца 10 шт": ("яйца", 10.0, "шт"),
+    }
+    for text, expected in cases.items():
+        items, _ = parse_shopping_list(text, limit=10)
+        parsed = [(item.canonical_name, item.amount, item.unit) for item in items]
+        assert parsed == [expected], f"{text!r}: {parsed}"
+    print("✅ Дробные количества разбираются правильно")
+
+def test_percent_and_fractions():
+    print(" Тестируем проценты жирности и дроби...")
+
+    cases = {
+        "молоко 3.2%": ("молоко 3.2%", "", None, None),
+        "молоко 3,2%": ("молоко 3,2%", "", None, None),
+        "молоко 3,2% 1 л": ("молоко 3,2%", "1 л", 1000.0, "мл"),
+        "творог 5% 2 уп": ("творог 5%", "2 уп", 2.0, "уп"),
+        "1/2 тыквы": ("тыквы", "0.5 шт", 0.5, "шт"),
+        "сливочное масло 1/4 кг": ("сливочное масло", "0.25 кг", 250.0, "г"),
+    }
+    for text, expected in cases.items():
+        item = parse_ingredient(text)
+        parsed = (item.name, item.quantity, item.amount, item.unit)
+        assert parsed == expected, f"{text!r}: {parsed}"
+    print("✅ Процент жирности остается в названии, дробь становится количеством")
+
+def test_import_limits():
+    print(" Тестируем ограничения импорта списка...")
+
+    items, truncated = parse_shopping_list("а" * 300 + " 2 шт\nмолоко\nхлеб", limit=2)
+    assert truncated and len(items) == 2
+    assert len(items[0].name) <= 100 and len(items[0].canonical_name) <= 100
+
+    items, truncated = parse_shopping_list("молоко\nмолоко 2 л", limit=1)
+    assert not truncated and items[0].quantity == "2 л"
+    print("✅ Длинные названия обрезаются, лишние продукты отмечаются")
+
+def test_categories():
+    print(" Тестируем категории продуктов...")
+
+    cases = {
+        "печенье": "сладости",
+        "нутелла": "сладости",
+        "банан": "фрукты",
+        "яблоко": "фрукты",
+        "печень говяжья": "белки",
+        "нут": "белки",
+        "томатная паста": "бакалея",
+        "сливки": "молочные",
+        "сливы": "фрукты",
+        "апельсиновый сок": "напитки",
+        "хлеб бородинский": "хлеб",
+    }
+    for name, expected in cases.items():
+        category = categorizer.categorize(name)
+        assert category == expected, f"{name!r}: {category}"
+    print("✅ Категории определяются правильно")
+
+if __name__ == "__main__":
+    test_decimal_quantities()
+    test_percent_and_fractions()
+    test_import_limits()
+    test_categories()
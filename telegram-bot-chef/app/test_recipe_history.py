@@ -0,0 +1,99 @@
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy.dialects import postgresql
+
+from recipe_cache import ingredient_keys
+from recipe_history import decode_cursor, encode_cursor, list_recipes, search_recipes
+
+class RecordingSession:
+    """Сессия, которая запоминает запросы и возвращает заданные строки"""
+
+    def __init__(self, rows=()):
+        self.statements = []
+        self.rows = [SimpleNamespace(_mapping=row) for row in rows]
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self.rows
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+def _recipe(recipe_id: int, created_at: datetime):
+    return {"id": recipe_id, "title": f"Рецепт {recipe_id}", "created_at": created_at}
+
+def test_cursor_round_trip():
+    print(" Тестируем курсоры истории рецептов...")
+
+    moments = [
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+        datetime(2026, 10, 18, 12, 30, 45, 123456, tzinfo=timezone.utc),
+        datetime(2026, 10, 18, 15, 30, 45, 999999, tzinfo=timezone(timedelta(hours=3))),
+    ]
+    for created_at in moments:
+        for recipe_id in (1, 255, 2 ** 31 + 7):
+            cursor = encode_cursor(created_at, recipe_id)
+            assert len(cursor) <= 32, "курсор должен помещаться в callback_data"
+            assert decode_cursor(cursor) == (created_at, recipe_id), cursor
+
+    for broken in ("", "abc", "1.2.3", "zz.1"):
+        try:
+            decode_cursor(broken)
+            assert False, f"{broken!r} должен быть отклонен"
+        except ValueError:
+            pass
+    print("✅ Курсор восстанавливает время с точностью до микросекунды и id")
+
+def test_list_pages():
+    print(" Тестируем страницы истории рецептов...")
+
+    now = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+    # Два рецепта с одинаковым временем различаются по id
+    newest_first = [_recipe(5, now), _recipe(4, now), _recipe(3, now - timedelta(seconds=1))]
+
+    session = RecordingSession(newest_first)
+    page = asyncio.run(list_recipes(session, user_id=1, limit=2))
+    assert [item["id"] for item in page.items] == [5, 4]
+    assert page.next_cursor == encode_cursor(now, 4) and page.prev_cursor is None
+    sql = _sql(session.statements[0])
+    assert "ORDER BY recipes.created_at DESC, recipes.id DESC" in sql, sql
+
+    session = RecordingSession(newest_first[2:])
+    page = asyncio.run(list_recipes(session, user_id=1, limit=2, after=encode_cursor(now, 4)))
+    assert [item["id"] for item in page.items] == [3]
+    assert page.next_cursor is None and page.prev_cursor == encode_cursor(now - timedelta(seconds=1), 3)
+    assert "(recipes.created_at, recipes.id) < (" in _sql(session.statements[0])
+
+    # Назад запрос идет по возрастанию, а страница все равно показывается от новых к старым
+    session = RecordingSession(list(reversed(newest_first[:2])))
+    page = asyncio.run(list_recipes(session, user_id=1, limit=2, before=encode_cursor(now - timedelta(seconds=1), 3)))
+    assert [item["id"] for item in page.items] == [5, 4]
+    assert page.next_cursor == encode_cursor(now, 4) and page.prev_cursor is None
+    sql = _sql(session.statements[0])
+    assert "(recipes.created_at, recipes.id) > (" in sql and "ORDER BY recipes.created_at, recipes.id" in sql
+    print("✅ Страницы упорядочены по (created_at, id), курсоры ведут в обе стороны")
+
+def test_ingredient_search_keys():
+    print(" Тестируем поиск рецептов по продуктам...")
+
+    stored = ingredient_keys(["помидоры черри - 200 г", "яйца - 3 шт", "куриное филе - 400 г"])
+    for query in (["помидоры", "яйцо", "курица"], ["томаты"], ["Яйца 2 шт"]):
+        keys = ingredient_keys(query)
+        assert keys and set(keys) <= set(stored), f"{query!r}: {keys} не входит в {stored}"
+
+    session = RecordingSession()
+    asyncio.run(search_recipes(session, user_id=1, ingredients=["помидоры", "яйцо", "курица"]))
+    params = session.statements[0].compile(dialect=postgresql.dialect()).params
+    assert sorted(["курица", "помидоры", "яйца"]) in params.values(), params
+    print("✅ Продукты запроса и рецепта сравниваются по каноническим названиям")
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_list_pages()
+    test_ingredient_search_keys()
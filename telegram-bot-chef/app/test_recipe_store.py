@@ -0,0 +1,63 @@
+import importlib.util
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from models import RecipeContent
+from recipe_store import content_hash, content_to_recipe
+
+RECIPE = {
+    "title": "Омлет с помидорами",
+    "ingredients": ["Яйца - 3 шт", "Помидоры - 2 шт", "Молоко - 50 мл"],
+    "instructions": ["Взбейте яйца с молоком.", "Обжарьте помидоры.", "Залейте яйцами и готовьте 5 минут."],
+    "cooking_time": 15,
+    "difficulty": "Легко"
+}
+
+def test_content_hash_normalization():
+    print(" Тестируем хэш содержимого рецепта...")
+
+    same = {
+        "title": "  омлет   С ПОМИДОРАМИ ",
+        "ingredients": ["яйца - 3 шт", "помидоры  -  2 шт", "МОЛОКО - 50 мл"],
+        "instructions": ["Взбейте яйца с молоком.", "", "  Обжарьте   помидоры.", "Залейте яйцами и готовьте 5 минут. "],
+        "cooking_time": 15,
+        "difficulty": "легко"
+    }
+    assert content_hash(same) == content_hash(RECIPE), "регистр, пробелы и пустые шаги не меняют хэш"
+    assert content_hash(dict(RECIPE, title="Омлёт с помидорами")) == content_hash(dict(RECIPE, title="Омлет с помидорами"))
+
+    for field, value in (
+        ("title", "Омлет с сыром"),
+        ("ingredients", list(reversed(RECIPE["ingredients"]))),
+        ("instructions", RECIPE["instructions"][:2]),
+        ("cooking_time", 20),
+        ("difficulty", "Средне"),
+    ):
+        assert content_hash(dict(RECIPE, **{field: value})) != content_hash(RECIPE), field
+    print("✅ Хэш не зависит от оформления, но различает содержимое")
+
+def test_stored_recipe_keeps_hash():
+    print(" Тестируем хэш сохраненного рецепта...")
+
+    stored = RecipeContent(
+        title=RECIPE["title"],
+        ingredients=RECIPE["ingredients"],
+        instructions="\n".join(RECIPE["instructions"]),
+        cooking_time=RECIPE["cooking_time"],
+        difficulty=RECIPE["difficulty"]
+    )
+    assert content_hash(content_to_recipe(stored)) == content_hash(RECIPE)
+
+    # Миграция 0006 считает хэш своей копией функции - старые и новые рецепты должны совпадать
+    path = os.path.join(os.path.dirname(__file__), "migrations", "versions", "0006_shared_recipe_contents.py")
+    spec = importlib.util.spec_from_file_location("migration_0006", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    assert migration._content_hash(RECIPE) == content_hash(RECIPE)
+    print("✅ Прочитанный из базы рецепт и миграция 0006 дают тот же хэш")
+
+if __name__ == "__main__":
+    test_content_hash_normalization()
+    test_stored_recipe_keeps_hash()
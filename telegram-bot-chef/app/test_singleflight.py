@@ -0,0 +1,55 @@
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from singleflight import SingleFlight
+
+async def _slow_call(started: asyncio.Event, finished: list, value: str):
+    started.set()
+    try:
+        await asyncio.sleep(0.1)
+    except asyncio.CancelledError:
+        finished.append("cancelled")
+        raise
+    finished.append(value)
+    return value
+
+async def _one_waiter_leaves():
+    flight = SingleFlight()
+    started, finished = asyncio.Event(), []
+    first = asyncio.create_task(flight.do("key", lambda: _slow_call(started, finished, "рецепт")))
+    second = asyncio.create_task(flight.do("key", lambda: _slow_call(started, finished, "другой")))
+    await started.wait()
+    first.cancel()
+    assert await second == "рецепт"
+    assert finished == ["рецепт"]
+    assert flight.executions == 1 and flight.deduplicated == 1 and flight.abandoned == 0
+    assert flight.stats()["in_flight"] == 0
+
+async def _all_waiters_leave():
+    flight = SingleFlight()
+    started, finished = asyncio.Event(), []
+    waiters = [asyncio.create_task(flight.do("key", lambda: _slow_call(started, finished, "рецепт")))
+               for _ in range(2)]
+    await started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert finished == ["cancelled"]
+    assert flight.abandoned == 1
+    assert flight.stats()["in_flight"] == 0
+
+    # Новый вызов с тем же ключом не получает отмененный результат
+    assert await flight.do("key", lambda: _slow_call(asyncio.Event(), [], "новый")) == "новый"
+
+def test_waiter_cancellation():
+    print(" Тестируем отмену ожидающих общего вызова...")
+    asyncio.run(_one_waiter_leaves())
+    asyncio.run(_all_waiters_leave())
+    print("✅ Вызов доживает до последнего ожидающего и отменяется, когда уходят все")
+
+if __name__ == "__main__":
+    test_waiter_cancellation()
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import LRUCache
+from config import config
+
+# Канал LISTEN/NOTIFY, по которому процессы сообщают друг другу об изменении данных пользователя
+INVALIDATION_CHANNEL = "user_cache_invalidation"
+
+class UserCache:
+    """Кэш содержимого холодильника и профилей пользователей.
+    Записи сбрасываются при изменении данных. С sync изменения рассылаются через NOTIFY
+    всем процессам (вебхук на нескольких воркерах uvicorn), иначе сбрасывается только
+    кэш текущего процесса, а остальные видят изменения через TTL"""
+
+    def __init__(self, max_entries: int, ttl: int, sync: bool):
+        self.fridge = LRUCache(max_entries, ttl)
+        self.profiles = LRUCache(max_entries, ttl)
+        self.sync = sync
+        self._listener_task: Optional[asyncio.Task] = None
+        self.remote_invalidations = 0
+        self.reconnects = 0
+
+    def invalidate_fridge(self, user_id: int):
+        self.fridge.invalidate(user_id)
+
+    def invalidate_profile(self, user_id: int):
+        self.profiles.invalidate(user_id)
+
+    async def notify_fridge(self, db: AsyncSession, user_id: int):
+        await self._notify(db, "fridge", user_id)
+
+    async def notify_profile(self, db: AsyncSession, user_id: int):
+        await self._notify(db, "profile", user_id)
+
+    async def _notify(self, db: AsyncSession, kind: str, user_id: int):
+        """Ставит уведомление в транзакцию db: другие процессы получат его только после коммита"""
+        if self.sync:
+            await db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": INVALIDATION_CHANNEL, "payload": f"{kind}:{user_id}"}
+            )
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        kind, _, user_id = payload.partition(":")
+        if kind == "fridge":
+            self.invalidate_fridge(int(user_id))
+        elif kind == "profile":
+            self.invalidate_profile(int(user_id))
+        self.remote_invalidations += 1
+
+    async def start(self):
+        if self.sync:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+
+    async def _listen(self):
+        """Держит отдельное соединение с LISTEN и переподключается при обрыве"""
+        dsn = make_url(config.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except Exception as e:
+                print(f"❌ Не удалось подключиться для синхронизации кэша пользователей: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            try:
+                await connection.add_listener(INVALIDATION_CHANNEL, self._on_notification)
+                # Пока LISTEN не работал, уведомления могли потеряться
+                self.fridge.clear()
+                self.profiles.clear()
+                print("✅ Кэш пользователей синхронизируется между процессами")
+                await lost.wait()
+                print("⚠️ Соединение синхронизации кэша пользователей потеряно")
+            except Exception as e:
+                print(f"❌ Ошибка синхронизации кэша пользователей: {e}")
+            finally:
+                await connection.close()
+            self.reconnects += 1
+            await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fridge": self.fridge.stats(),
+            "profiles": self.profiles.stats(),
+            "sync": self.sync,
+            "remote_invalidations": self.remote_invalidations,
+            "reconnects": self.reconnects
+        }
+
+user_cache = UserCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL, config.USER_CACHE_SYNC)
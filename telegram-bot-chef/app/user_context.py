@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from ingredient_parser import ParsedIngredient
+
+@dataclass(frozen=True)
+class UserProfile:
+    """Профиль пользователя из таблицы users"""
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    dietary_preferences: Tuple[str, ...]
+    allergies: Tuple[str, ...]
+    cooking_skill: str
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, row) -> "UserProfile":
+        return cls(
+            telegram_id=row.telegram_id,
+            username=row.username,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            dietary_preferences=tuple(row.dietary_preferences or ()),
+            allergies=tuple(row.allergies or ()),
+            cooking_skill=row.cooking_skill or "новичок",
+            created_at=row.created_at
+        )
+
+@dataclass(frozen=True)
+class UserContext:
+    """Все данные пользователя, нужные для обработки одного запроса"""
+    user_id: int
+    profile: Optional[UserProfile]
+    fridge_items: Tuple[ParsedIngredient, ...]
+
+    @property
+    def exists(self) -> bool:
+        return self.profile is not None
+
+    @property
+    def preferences(self) -> Dict[str, Any]:
+        if not self.profile:
+            return {"dietary_preferences": [], "allergies": [], "cooking_skill": "новичок"}
+        return {
+            "dietary_preferences": list(self.profile.dietary_preferences),
+            "allergies": list(self.profile.allergies),
+            "cooking_skill": self.profile.cooking_skill
+        }